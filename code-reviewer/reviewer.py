@@ -1,5 +1,8 @@
 import os
+import re
+import ast
 import json
+import subprocess
 import argparse
 import shutil
 import logging
@@ -108,6 +111,17 @@ Do not include anything other than the final valid JSON.
 
 """
 
+DIFF_PROMPT = """
+You are only reviewing the regions of the file that changed. Each region is preceded by a header
+of the form `### Lines <START>-<END>`, and its lines are numbered as they appear in the full file.
+Use those file line numbers for `line_number`, and only suggest changes to the lines that changed.
+"""
+
+# Lines of context sent around a change when no enclosing function can be found
+DIFF_CONTEXT_LINES = 5
+
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
 class color:
    PURPLE = '\033[95m'
    CYAN = '\033[96m'
@@ -148,27 +162,80 @@ def update_code(old_code,new_code):
 	return filecontents
 	
 	
-def modify_code(generated_code_review):	
+def update_code_at_line(old_code, new_code, line_number, line_shifts):
+	"""
+	Replace old_code only where the suggestion points, unlike update_code which replaces
+	every copy in the file. line_number is as numbered before any change was applied;
+	line_shifts holds (line_number, added_lines) of the changes applied so far.
+	"""
+	global filecontents
+	start = int(line_number) + sum(added for line, added in line_shifts if line < int(line_number))
+	lines = filecontents.splitlines(keepends=True)
+	# Allow the model's line number to be off by one
+	first = max(start - 2, 0)
+	last = min(start + old_code.count("\n") + 1, len(lines))
+	offset = len("".join(lines[:first]))
+	window = "".join(lines[first:last])
+	position = window.find(old_code)
+	if position == -1:
+		print(color.YELLOW + f"Could not find the old code at line {line_number}, skipping this suggestion." + color.END)
+		logger.info(f"Old code not found around line {line_number}, suggestion skipped.")
+		return filecontents
+	logger.info(f"DEBUG: Implementing code reviewer's suggestion at line {line_number}")
+	position += offset
+	filecontents = filecontents[:position] + new_code + filecontents[position + len(old_code):]
+	line_shifts.append((int(line_number), new_code.count("\n") - old_code.count("\n")))
+	return filecontents
+
+
+def modify_code(generated_code_review, diff_mode=False):	
 	logger.info("Here are the following changes:")
-	for key, value  in generated_code_review.items():
-		print(f"Change: #{key}")
-		print(f"line_number: {value['line_number']}")
-		print(f"=========")
-		print("Explanation: " + color.BOLD + value['explanation'] + color.END)
-		print(value["line_before_code_change"])				
-		print("- " + color.BOLD + color.RED + value["old_code"] + color.END)		
-		print("+ " + color.BOLD + color.GREEN + value["new_code"] + color.END)		
-		print(value["line_after_code_change"])
-		print("\n")
-		ans = input("Do you want to implement this change? (y/N)").strip()
-		if ans == 'y' or ans == 'Y':
-			print("Suggestion accepted.")
-			updated_code = update_code(value["old_code"], value["new_code"])
-		elif ans == 'N' or ans == 'n':
-			print("Suggestion rejected.")
-			logger.info("Suggestion rejected.")
-		else:
-			print("Invalid response, please type y or N.")			
+	# Accepts either a parsed review dict or a stream of (key, suggestion) pairs
+	if isinstance(generated_code_review, dict):
+		generated_code_review = generated_code_review.items()
+	updated_code = filecontents
+	reviewed = 0
+	line_shifts = []
+	try:
+		for key, value  in generated_code_review:
+			reviewed += 1
+			logger.info(f"Suggestion #{key}: {json.dumps(value)}")
+			print(f"Change: #{key}")
+			print(f"line_number: {value['line_number']}")
+			print(f"=========")
+			print("Explanation: " + color.BOLD + value['explanation'] + color.END)
+			print(value["line_before_code_change"])				
+			print("- " + color.BOLD + color.RED + value["old_code"] + color.END)		
+			print("+ " + color.BOLD + color.GREEN + value["new_code"] + color.END)		
+			print(value["line_after_code_change"])
+			print("\n")
+			ans = input("Do you want to implement this change? (y/N)").strip()
+			if ans == 'y' or ans == 'Y':
+				print("Suggestion accepted.")
+				if diff_mode:
+					updated_code = update_code_at_line(value["old_code"], value["new_code"], value["line_number"], line_shifts)
+				else:
+					updated_code = update_code(value["old_code"], value["new_code"])
+			elif ans == 'N' or ans == 'n':
+				print("Suggestion rejected.")
+				logger.info("Suggestion rejected.")
+			else:
+				print("Invalid response, please type y or N.")			
+	except json.decoder.JSONDecodeError as e:
+		# Nothing was shown yet: the review is unusable, let code_review abort as before
+		if reviewed == 0:
+			raise
+		# The stream broke after some suggestions were reviewed, keep the ones already accepted
+		print(color.YELLOW + "The rest of the review is not valid JSON, continuing with the suggestions reviewed so far." + color.END)
+		logger.info(f"Review stream is not valid JSON after {reviewed} suggestions: {e}")
+	if diff_mode:
+		# Suggestions were applied at their lines only; sending the whole file to be rewritten
+		# would undo the small diff prompt and let the model touch unchanged code
+		print("\n=============")
+		print("Updated Code after implementing all the suggestions.")
+		print("=============\n")	
+		print(updated_code)
+		return updated_code
 	logger.info("Fixing indentation of the code...")
 	user_prompt = f"""Fix Syntax and indentation of this code : {updated_code}. DO NOT ADD ANY EXTRA INFORMARTION, I JUST NEED THE CODE, NO EXPLAINATION."""
 	messages=[    	
@@ -185,7 +252,93 @@ def modify_code(generated_code_review):
 
 		
 
-def code_review(file_path, model, preview, backup_dir):	
+def get_changed_ranges(file_path, rev):
+	"""Return the (start, end) line ranges of file_path changed since rev, as numbered in the working tree."""
+	try:
+		diff = subprocess.run(
+			["git", "diff", "--no-color", "--unified=0", rev, "--", file_path],
+			capture_output=True, text=True, check=True).stdout
+	except FileNotFoundError:
+		logger.info("git executable not found.")
+		logger.info("ABORTING...!!!")
+		exit(1)
+	except subprocess.CalledProcessError as e:
+		logger.info(f"git diff failed: {e.stderr.strip()}")
+		logger.info("ABORTING...!!!")
+		exit(1)
+
+	changed_ranges = []
+	for line in diff.splitlines():
+		match = HUNK_HEADER.match(line)
+		if not match:
+			continue
+		start = int(match.group(1))
+		count = int(match.group(2)) if match.group(2) is not None else 1
+		if count == 0:
+			# Pure deletion: the hunk sits between line `start` and the next one
+			changed_ranges.append((max(start, 1), start + 1))
+		else:
+			changed_ranges.append((start, start + count - 1))
+	return changed_ranges
+
+
+def merge_ranges(ranges):
+	merged = []
+	for start, end in sorted(ranges):
+		if merged and start <= merged[-1][1] + 1:
+			merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+		else:
+			merged.append((start, end))
+	return merged
+
+
+def expand_to_enclosing_functions(source, changed_ranges, file_path):
+	"""Widen each changed range to the innermost function around it, or to a few lines of context."""
+	total_lines = len(source.splitlines())
+	functions = []
+	if file_path.endswith(".py"):
+		try:
+			functions = [
+				(node.lineno, node.end_lineno) for node in ast.walk(ast.parse(source))
+				if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+			]
+		except SyntaxError:
+			logger.info(f"Could not parse {file_path}, falling back to {DIFF_CONTEXT_LINES} lines of context.")
+
+	regions = []
+	for start, end in changed_ranges:
+		enclosing = [(f_start, f_end) for f_start, f_end in functions if f_start <= start and end <= f_end]
+		if enclosing:
+			regions.append(min(enclosing, key=lambda f: f[1] - f[0]))
+		else:
+			regions.append((max(start - DIFF_CONTEXT_LINES, 1), min(end + DIFF_CONTEXT_LINES, total_lines)))
+	return merge_ranges(regions)
+
+
+def build_diff_prompt(source, regions):
+	lines = source.splitlines()
+	parts = []
+	for start, end in regions:
+		parts.append(f"### Lines {start}-{end}\n" + "\n".join(lines[start - 1:end]))
+	return "\n\n".join(parts)
+
+
+def filter_suggestions(suggestions, changed_ranges):
+	"""Drop suggestions whose old code does not overlap any changed line."""
+	for key, value in suggestions:
+		try:
+			first_line = int(value["line_number"])
+		except (KeyError, TypeError, ValueError):
+			logger.info(f"Skipping suggestion #{key} without a usable line_number.")
+			continue
+		last_line = first_line + value.get("old_code", "").count("\n")
+		if any(first_line <= end and start <= last_line for start, end in changed_ranges):
+			yield key, value
+		else:
+			logger.info(f"Skipping suggestion #{key} at line {first_line}, outside the changed lines.")
+
+
+def code_review(file_path, model, preview, backup_dir, diff_rev=None):	
 	global filecontents, original_contents
 	try:
 		with open(file_path, "r") as file:
@@ -212,19 +365,35 @@ def code_review(file_path, model, preview, backup_dir):
 		exit(1)
 
 	original_contents = filecontents
+	system_prompt = PROMPT
 	user_prompt = f"Code review for the following file : {filecontents}"
+	if diff_rev:
+		changed_ranges = get_changed_ranges(file_path, diff_rev)
+		if not changed_ranges:
+			print(f"No changes in {file_path} since {diff_rev}, nothing to review.")
+			logger.info(f"No changes in {file_path} since {diff_rev}.")
+			return
+		regions = expand_to_enclosing_functions(filecontents, changed_ranges, file_path)
+		logger.info(f"Reviewing changed lines {changed_ranges} using regions {regions}")
+		system_prompt = PROMPT + DIFF_PROMPT
+		user_prompt = f"Code review for the following changed regions of {file_path} : \n{build_diff_prompt(filecontents, regions)}"
 	messages=[
-    	{"role": "system", "content": PROMPT},
+    	{"role": "system", "content": system_prompt},
 		{"role": "user", "content": user_prompt},    	    
   	]
-	generated_code_review = make_openai_request(messages)	
-	generated_code_review = generated_code_review.replace("json", "")
-	generated_code_review = generated_code_review.replace("```", "")		
-
-	logger.info(generated_code_review)
+	# Suggestions are parsed as the completion streams in, so the first one
+	# can be reviewed while the model is still generating the rest.
+	generated_code_review = parse_review_stream(make_openai_stream_request(messages, model))
+	if diff_rev:
+		generated_code_review = filter_suggestions(generated_code_review, changed_ranges)
 	try:
-		generated_code_review = json.loads(generated_code_review)			
-		updated_code = modify_code(generated_code_review)
+		updated_code = modify_code(generated_code_review, diff_mode=bool(diff_rev))
+		if diff_rev and file_path.endswith(".py") and updated_code != original_contents:
+			try:
+				ast.parse(updated_code)
+			except SyntaxError as e:
+				print(color.YELLOW + f"Warning: the updated code has a syntax error at line {e.lineno}: {e.msg}" + color.END)
+				logger.info(f"Updated code has a syntax error: {e}")
 		if not preview:
 			update_python_file(file_path, updated_code, backup_dir)
 	except json.decoder.JSONDecodeError as e:
@@ -247,17 +416,85 @@ def make_openai_request(messages, model = "gpt-4o-mini"):
 	return message_content
 
 
+def make_openai_stream_request(messages, model = "gpt-4o-mini"):
+	"""Yield the content deltas of a streamed chat completion."""
+	response = client.chat.completions.create(
+		model = model,
+		messages = messages,
+		stream = True)
+
+	for chunk in response:
+		# Azure sends a leading chunk with no choices (content filter results)
+		if chunk.choices and chunk.choices[0].delta.content:
+			yield chunk.choices[0].delta.content
+
+
+def parse_review_stream(chunks):
+	"""
+	Incrementally parse a streamed code review.
+	Yields (key, suggestion) pairs as soon as each numbered suggestion object closes.
+	Anything before the outermost '{' (e.g. a ```json fence) is ignored, so the
+	code inside the suggestions is never touched.
+	"""
+	buffer = ""
+	pos = 0
+	depth = 0
+	in_string = False
+	escaped = False
+	key = None
+	key_start = None
+	object_start = None
+	for chunk in chunks:
+		buffer += chunk
+		while pos < len(buffer):
+			char = buffer[pos]
+			if depth == 0:
+				if char == "{":
+					depth = 1
+			elif in_string:
+				if escaped:
+					escaped = False
+				elif char == "\\":
+					escaped = True
+				elif char == '"':
+					in_string = False
+					if depth == 1:
+						key = json.loads(buffer[key_start:pos + 1])
+			elif char == '"':
+				in_string = True
+				if depth == 1:
+					key_start = pos
+			elif char in "{[":
+				depth += 1
+				if depth == 2:
+					object_start = pos
+			elif char in "}]":
+				if depth == 2 and object_start is not None:
+					suggestion = json.loads(buffer[object_start:pos + 1])
+					object_start = None
+					if isinstance(suggestion, dict):
+						yield key, suggestion
+				depth -= 1
+				if depth == 0:
+					return
+			pos += 1
+	if depth == 0:
+		raise json.decoder.JSONDecodeError("No JSON object found in the review", buffer, 0)
+	raise json.decoder.JSONDecodeError("Review ended before the JSON object was closed", buffer, len(buffer))
+
+
 def main():
 	parser = argparse.ArgumentParser(description="Path of file which needs to be reviewed")
 	parser.add_argument("file")
 	parser.add_argument("-b", "--backup-directory", dest="backup_dir", default = "./backup")
 	parser.add_argument("--model", default = "gpt-4o-mini")
 	parser.add_argument("-p", "--preview", action='store_true')		
+	parser.add_argument("--diff", dest="diff_rev", metavar="REV", help="Only review the lines changed since this git revision")
 	args = parser.parse_args()
 	if args.preview:
 		logger.info("Preview mode enabled!")
 		logger.info(args.preview)
-	code_review(args.file, args.model, args.preview, args.backup_dir)
+	code_review(args.file, args.model, args.preview, args.backup_dir, args.diff_rev)
 
 
 if __name__ == "__main__":
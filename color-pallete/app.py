@@ -1,43 +1,317 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, abort, g
 from openai import AzureOpenAI
 from dotenv import load_dotenv
+from collections import OrderedDict
 import os
+import re
 import json 
+import time
+import threading
 
 load_dotenv()
 API_KEY = os.getenv("OPENAI_API_KEY")
 AZURE_ENDPOINT =  os.getenv("OPENAI_ENDPOINT")
+
+# Completions running at once in this process, and seconds a request waits for a free slot before a 503
+LLM_CONCURRENCY = int(os.getenv("PALETTE_LLM_CONCURRENCY", "8"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("PALETTE_LLM_QUEUE_TIMEOUT", "5"))
+# Seconds a completion may take, and how often a failed one is retried
+LLM_TIMEOUT = float(os.getenv("PALETTE_LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("PALETTE_LLM_MAX_RETRIES", "2"))
+# Extra completions asked for when a reply has no usable palette at all
+PALETTE_PARSE_RETRIES = int(os.getenv("PALETTE_PARSE_RETRIES", "1"))
+
 client = AzureOpenAI(
 		api_version = "",
 		api_key = API_KEY,
-		azure_endpoint = AZURE_ENDPOINT)
+		azure_endpoint = AZURE_ENDPOINT,
+		timeout = LLM_TIMEOUT,
+		max_retries = LLM_MAX_RETRIES)
+
+completion_slots = threading.BoundedSemaphore(LLM_CONCURRENCY)
+
+PALETTE_CACHE_SIZE = int(os.getenv("PALETTE_CACHE_SIZE", "1024"))
+PALETTE_CACHE_TTL = int(os.getenv("PALETTE_CACHE_TTL", "3600"))
+
+
+class PaletteCache:
+	"""
+	Thread-safe LRU cache of palettes by prompt, whose entries expire after `ttl` seconds.
+	Concurrent misses for the same prompt share one completion: the first request runs
+	it and the others wait for its result.
+	"""
+
+	def __init__(self, maxsize=1024, ttl=3600):
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self.hits = 0
+		self.misses = 0
+		self._entries = OrderedDict()
+		self._inflight = {}
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def key(prompt):
+		return " ".join((prompt or "").lower().split())
+
+	def _claim(self, key):
+		"""Returns (value, inflight, leader): inflight is None on a hit, else leader tells whether this caller runs the completion."""
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry and entry[1] > time.monotonic():
+				self._entries.move_to_end(key)
+				self.hits += 1
+				return entry[0], None, False
+			self._entries.pop(key, None)
+			inflight = self._inflight.get(key)
+			if inflight is None:
+				inflight = self._inflight[key] = {"done": threading.Event(), "value": None}
+				self.misses += 1
+				return None, inflight, True
+			# Waiting on another request's completion counts as a hit
+			self.hits += 1
+			return None, inflight, False
+
+	def _finish(self, key, inflight, value):
+		with self._lock:
+			if value:
+				self._entries[key] = (value, time.monotonic() + self.ttl)
+				self._entries.move_to_end(key)
+				while len(self._entries) > self.maxsize:
+					self._entries.popitem(last=False)
+			self._inflight.pop(key, None)
+		inflight["value"] = value
+		inflight["done"].set()
+
+	def get_or_load(self, prompt, loader):
+		"""Return the cached palette for prompt, or call loader() to generate it. Empty results are not cached."""
+		key = self.key(prompt)
+		value, inflight, leader = self._claim(key)
+		if inflight is None:
+			return value
+		if not leader:
+			inflight["done"].wait()
+			# The value is None when the leader's completion failed, then this request tries itself
+			return inflight["value"] or loader()
+		value = None
+		try:
+			value = loader()
+			return value
+		finally:
+			self._finish(key, inflight, value)
+
+
+palette_cache = PaletteCache(PALETTE_CACHE_SIZE, PALETTE_CACHE_TTL)
+
+
+class Metrics:
+	"""Request counts and latency histograms per route, rendered in the Prometheus text format."""
+
+	BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+	def __init__(self):
+		self.requests = {}
+		self.latency = {}
+		self.completions_rejected = 0
+		self.completions_in_flight = 0
+		self._lock = threading.Lock()
+
+	def observe(self, route, status, seconds):
+		with self._lock:
+			self.requests[(route, status)] = self.requests.get((route, status), 0) + 1
+			histogram = self.latency.setdefault(route, {"buckets": [0] * len(self.BUCKETS), "sum": 0.0, "count": 0})
+			for i, bound in enumerate(self.BUCKETS):
+				if seconds <= bound:
+					histogram["buckets"][i] += 1
+			histogram["sum"] += seconds
+			histogram["count"] += 1
+
+	def reject(self):
+		with self._lock:
+			self.completions_rejected += 1
+
+	def track_completion(self, delta):
+		with self._lock:
+			self.completions_in_flight += delta
+
+	def render(self, cache):
+		with self._lock:
+			lines = [
+				"# HELP palette_requests_total HTTP requests by route and status.",
+				"# TYPE palette_requests_total counter",
+			]
+			for (route, status), count in sorted(self.requests.items()):
+				lines.append(f'palette_requests_total{{route="{route}",status="{status}"}} {count}')
+			lines += [
+				"# HELP palette_request_duration_seconds HTTP request latency by route.",
+				"# TYPE palette_request_duration_seconds histogram",
+			]
+			for route, histogram in sorted(self.latency.items()):
+				for bound, count in zip(self.BUCKETS, histogram["buckets"]):
+					lines.append(f'palette_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {count}')
+				lines.append(f'palette_request_duration_seconds_bucket{{route="{route}",le="+Inf"}} {histogram["count"]}')
+				lines.append(f'palette_request_duration_seconds_sum{{route="{route}"}} {histogram["sum"]:.6f}')
+				lines.append(f'palette_request_duration_seconds_count{{route="{route}"}} {histogram["count"]}')
+			rejected = self.completions_rejected
+			in_flight = self.completions_in_flight
+		lookups = cache.hits + cache.misses
+		lines += [
+			"# HELP palette_cache_hits_total Palette cache hits, including requests that waited on an identical one.",
+			"# TYPE palette_cache_hits_total counter",
+			f"palette_cache_hits_total {cache.hits}",
+			"# HELP palette_cache_misses_total Palette cache misses.",
+			"# TYPE palette_cache_misses_total counter",
+			f"palette_cache_misses_total {cache.misses}",
+			"# HELP palette_cache_hit_ratio Share of palette lookups answered from the cache.",
+			"# TYPE palette_cache_hit_ratio gauge",
+			f"palette_cache_hit_ratio {cache.hits / lookups if lookups else 0:.4f}",
+			"# HELP palette_completions_in_flight Completions running in this process.",
+			"# TYPE palette_completions_in_flight gauge",
+			f"palette_completions_in_flight {in_flight}",
+			"# HELP palette_completions_rejected_total Requests answered 503 because no completion slot was free.",
+			"# TYPE palette_completions_rejected_total counter",
+			f"palette_completions_rejected_total {rejected}",
+		]
+		return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def no_free_slot():
+	metrics.reject()
+	abort(503, description="Too many palettes are being generated, please try again shortly.")
+
+
+PALETTE_SYSTEM_PROMPT = """You are a colour pallete generating assistant that responds to text prompts with colour palettes.
+You should generate colours that fit the theme or mood of the prompt, from 2 to 8 colours.
+Respond with a JSON object holding an array of hexadecimal colour codes and no extra text, e.g. {"colors": ["#1B3A4B", "#F2C14E", "#E4572E"]}."""
+
+# A bare code must have all six digits, so a word like "add" isn't taken for #aadddd
+HEX_COLOR = re.compile(r"#([0-9a-fA-F]{6}|[0-9a-fA-F]{3})|([0-9a-fA-F]{6})")
+# Outside of JSON a colour needs its '#', so words like "facade" aren't read as colours
+HEX_COLOR_IN_TEXT = re.compile(r"#([0-9a-fA-F]{6}|[0-9a-fA-F]{3})\b")
+CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+class PaletteFormatError(ValueError):
+	pass
+
+
+def palette_messages(prompt):
+	return [
+		{"role": "system", "content": PALETTE_SYSTEM_PROMPT},
+		{"role": "user", "content": prompt},
+	]
+
+
+def normalize_hex(code):
+	"""Returns the colour as #rrggbb, expanding the #rgb short form."""
+	code = code.lower()
+	if len(code) == 3:
+		code = "".join(c * 2 for c in code)
+	return "#" + code
+
+
+def palette_strings(value):
+	"""Returns the strings of the "colors" array, or of a bare top-level array."""
+	if isinstance(value, dict):
+		value = value.get("colors")
+	if isinstance(value, str):
+		# "colors": "#123456, #abcdef"
+		value = value.split(",")
+	if not isinstance(value, list):
+		return []
+	return [item.strip() for item in value if isinstance(item, str)]
+
+
+def parse_colors(content):
+	"""
+	Read the palette from the model's reply: the "colors" array (or comma separated string)
+	of a JSON object or a bare JSON array of hex codes. When that gives fewer than two
+	colours, as with JSON under another key or no JSON at all, any #hex codes in the text
+	are used instead (code fences, quotes, other spacing). Codes are normalized to
+	#rrggbb and duplicates dropped. Raises PaletteFormatError when fewer than
+	two colours can be found.
+	"""
+	content = CODE_FENCE.sub("", (content or "").strip())
+	try:
+		matches = (HEX_COLOR.fullmatch(value) for value in palette_strings(json.loads(content)))
+		codes = [match.group(1) or match.group(2) for match in matches if match]
+	except json.JSONDecodeError:
+		codes = []
+	colors = list(dict.fromkeys(normalize_hex(code) for code in codes))
+	if len(colors) < 2:
+		# Only codes written with their '#' count here, so words like "fab" stay out
+		colors = list(dict.fromkeys(normalize_hex(code) for code in HEX_COLOR_IN_TEXT.findall(content)))
+	colors = colors[:8]
+	if len(colors) < 2:
+		raise PaletteFormatError(f"No palette in the model's reply: {content[:200]!r}")
+	return colors
+
+
+def complete(prompt):
+	if not completion_slots.acquire(timeout=LLM_QUEUE_TIMEOUT):
+		no_free_slot()
+	metrics.track_completion(1)
+	try:
+		response = client.chat.completions.create(
+			messages = palette_messages(prompt),
+			model = "gpt-4o-mini",
+			response_format = {"type": "json_object"})
+	finally:
+		metrics.track_completion(-1)
+		completion_slots.release()
+	return response.choices[0].message.content
+
 
 def get_colors(prompt):
-	messages=[
-    	{"role": "assistant", 
-    	"content": f"""You are a colour pallete generating assistant that responds with a text prompts for colour palettes.
-    	You should generate colour that fits the theme or mood of the promt, colour list ranging from 2 to 8.
-    	Desired Format: Only want a array of hexadeciaml colour codes, no extra text, not even json.
-        
-    	Text: {prompt}.
-    	JSON Array:"""},    
-      ]
-	response = client.chat.completions.create(
-		messages = messages,
-		model = "gpt-4o-mini")
-	response = response.to_dict()
-	response = response["choices"][0]["message"]["content"]
-	response = response.strip('[]').split(', ')
-	return response
+	# Only a reply with no usable palette costs another completion
+	for attempt in range(PALETTE_PARSE_RETRIES + 1):
+		try:
+			return parse_colors(complete(prompt))
+		except PaletteFormatError as e:
+			if attempt == PALETTE_PARSE_RETRIES:
+				raise
+			app.logger.warning(f"{e}, asking again")
 
 
 app = Flask(__name__, template_folder="templates", static_url_path="", static_folder="static")
 
 
+@app.before_request
+def start_timer():
+	g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+	route = request.url_rule.rule if request.url_rule else "unmatched"
+	metrics.observe(route, response.status_code, time.perf_counter() - g.request_start)
+	return response
+
+
+@app.errorhandler(PaletteFormatError)
+def unparseable_palette(error):
+	app.logger.error(str(error))
+	return {"error": "The palette could not be generated, please try again."}, 502
+
+
+@app.errorhandler(503)
+def busy(error):
+	return {"error": error.description}, 503, {"Retry-After": str(int(LLM_QUEUE_TIMEOUT) or 1)}
+
+
+# Counters are kept in this process, serve.py runs a single worker so every scrape sees all of them
+@app.route("/metrics")
+def prometheus_metrics():
+	return metrics.render(palette_cache), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+
 @app.route("/palette", methods=["POST"])
 def prompt():
 	query = request.form.get("query")
-	colors = get_colors(query)
+	colors = palette_cache.get_or_load(query, lambda: get_colors(query))
 	return {"colors" : colors}
 
 
@@ -0,0 +1,51 @@
+"""
+Production entry point for the palette app: gunicorn serving requests on a pool of threads.
+The work is almost all waiting on completions, so one process with many threads is
+enough, and it keeps a single palette cache, completion limit and set of /metrics counters.
+
+	python serve.py
+
+Settings come from the environment:
+	PALETTE_BIND       address to listen on (default 0.0.0.0:8000)
+	PALETTE_WORKERS    worker processes (default 1)
+	PALETTE_THREADS    threads per worker (default 32)
+	PALETTE_TIMEOUT    seconds a worker may be silent before it is restarted (default 60)
+
+With more than one worker, each worker has its own palette cache, completion limit
+(PALETTE_LLM_CONCURRENCY) and /metrics counters, and successive Prometheus scrapes land
+on different workers, so counters appear to reset and rates are meaningless. Run
+several single-worker instances on separate ports, each scraped on its own, instead.
+"""
+import os
+from gunicorn.app.base import BaseApplication
+
+
+class PaletteServer(BaseApplication):
+
+	def __init__(self, options):
+		self.options = options
+		super().__init__()
+
+	def load_config(self):
+		for key, value in self.options.items():
+			self.cfg.set(key, value)
+
+	def load(self):
+		# Imported in each worker, so no client connections are shared across the fork
+		from app import app
+		return app
+
+
+if __name__ == "__main__":
+	workers = int(os.getenv("PALETTE_WORKERS", "1"))
+	if workers > 1:
+		print(f"Warning: running {workers} workers, /metrics only reports the worker that answers each scrape.")
+	PaletteServer({
+		"bind": os.getenv("PALETTE_BIND", "0.0.0.0:8000"),
+		"workers": workers,
+		"worker_class": "gthread",
+		"threads": int(os.getenv("PALETTE_THREADS", "32")),
+		"timeout": int(os.getenv("PALETTE_TIMEOUT", "60")),
+		"graceful_timeout": 30,
+		"keepalive": 5,
+	}).run()
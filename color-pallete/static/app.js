@@ -16,15 +16,33 @@ function getColors() {
       query: query,
     }),
   })
-    .then((response) => response.json())
-    .then((data) => {
-      const colors = data.colors;
-      console.log(colors)
+    .then((response) =>
+      response
+        .json()
+        .catch(() => ({}))
+        .then((data) => ({ ok: response.ok, status: response.status, data: data }))
+    )
+    .then(({ ok, status, data }) => {
       const container = document.querySelector(".container");
-      createColorBoxes(colors, container);
+      if (!ok || !Array.isArray(data.colors)) {
+        showError(data.error || `Request failed (${status})`, container);
+        return;
+      }
+      createColorBoxes(data.colors, container);
+    })
+    .catch(() => {
+      showError("Could not reach the server", document.querySelector(".container"));
     });
 }
 
+function showError(message, parent) {
+  parent.innerHTML = "";
+  const p = document.createElement("p");
+  p.classList.add("error");
+  p.innerText = message;
+  parent.appendChild(p);
+}
+
 function createColorBoxes(colors, parent) {
   parent.innerHTML = "";
   for (const color of colors) {
@@ -1,11 +1,17 @@
 import os
-from slack_bolt import App, logger
+from slack_bolt import App, BoltResponse, logger
 from dotenv import load_dotenv
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 import json
 import sys
+import time
 import llm
 import pprint
+from concurrent.futures import ThreadPoolExecutor
+from cache import TTLCache, SeenSet, event_key
+from memory import ConversationStore
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
 
 # Load environment variables
 load_dotenv()
@@ -26,13 +32,64 @@ if not SLACK_APP_TOKEN:
 print("Using SLACK_BOT_TOKEN (first 10 chars):", SLACK_BOT_TOKEN[:10] + "...")
 print("Using SLACK_APP_TOKEN (first 10 chars):", SLACK_APP_TOKEN[:10] + "...")
 
-# Initialize the app with timeout settings
-app = App(
-    token=SLACK_BOT_TOKEN    
+# User and channel metadata is cached to stay clear of Slack's rate limits
+METADATA_TTL = int(os.getenv("SLACK_METADATA_TTL", "3600"))
+WARM_METADATA_CACHE = os.getenv("SLACK_WARM_METADATA_CACHE", "false").lower() in ("1", "true", "yes")
+
+# Stream answers into Slack, editing the reply at most once per interval (chat.update is rate limited)
+LLM_STREAM = os.getenv("LLM_STREAM", "false").lower() in ("1", "true", "yes")
+STREAM_UPDATE_INTERVAL = float(os.getenv("SLACK_STREAM_UPDATE_INTERVAL", "1.0"))
+STREAM_FINAL_UPDATE_ATTEMPTS = 3
+
+# Redelivered events are skipped, and LLM work runs off Bolt's listener threads
+EVENT_DEDUP_WINDOW = int(os.getenv("SLACK_EVENT_DEDUP_WINDOW", "600"))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "8"))
+
+# Recent turns of each thread are kept in memory (and optionally SQLite) for follow-up questions
+conversations = ConversationStore(
+    token_budget=int(os.getenv("CONVERSATION_TOKEN_BUDGET", "2000")),
+    max_threads=int(os.getenv("CONVERSATION_MAX_THREADS", "1000")),
+    ttl=int(os.getenv("CONVERSATION_TTL", "86400")),
+    db_path=os.getenv("CONVERSATION_DB") or None
 )
 
+# Optional Web API base URL, e.g. the load-test stub server (loadtest.py)
+SLACK_API_URL = os.getenv("SLACK_API_URL")
+
+# Initialize the app with timeout settings
+if SLACK_API_URL:
+    app = App(
+        client=WebClient(token=SLACK_BOT_TOKEN, base_url=SLACK_API_URL)
+    )
+else:
+    app = App(
+        token=SLACK_BOT_TOKEN    
+    )
+
+channel_cache = TTLCache(ttl=METADATA_TTL)
+user_cache = TTLCache(ttl=METADATA_TTL)
+seen_events = SeenSet(window=EVENT_DEDUP_WINDOW)
+llm_executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm")
+
+
+@app.middleware
+def skip_duplicate_events(body, next, logger):
+    """Acknowledge redelivered events without running their listeners again."""
+    key = event_key(body)
+    if key is not None and not seen_events.add(key):
+        logger.info(f"Skipping duplicate event {key}")
+        return BoltResponse(status=200, body="")
+    next()
+
 
 def get_channel_name(channel_id):
+    """
+    Get channel name from channel ID, cached for SLACK_METADATA_TTL seconds
+    """
+    return channel_cache.get_or_load(channel_id, lambda: fetch_channel_name(channel_id))
+
+
+def fetch_channel_name(channel_id):
     """
     Get channel name from channel ID using conversations.info
     """
@@ -42,49 +99,86 @@ def get_channel_name(channel_id):
             channel_info = result["channel"]
             return channel_info["name"]
         else:
-            logger.error(f"Error getting channel info: {result['error']}")
+            app.logger.error(f"Error getting channel info: {result['error']}")
             return None
     except Exception as e:
-        logger.error(f"Exception getting channel info: {e}")
+        app.logger.error(f"Exception getting channel info: {e}")
         return None
 
 
 def get_username(user_id):
     """
-    Get username from user ID using users.info
+    Get username from user ID, using the cached user information
     """
-    try:
-        result = app.client.users_info(user=user_id)        
-        if result["ok"]:
-            user_info = result["user"]
-            # Return display name if available, otherwise username
-            return user_info.get("profile", {}).get("display_name") or user_info.get("name")
-        else:
-            logger.error(f"Error getting user info: {result['error']}")
-            return None
-    except Exception as e:
-        logger.error(f"Exception getting user info: {e}")
+    user_info = get_user_info(user_id)
+    if user_info is None:
         return None
+    # Return display name if available, otherwise username
+    return user_info.get("profile", {}).get("display_name") or user_info.get("name")
 
 
 def get_user_info(user_id):
     """
-    Get full user information from user ID
+    Get full user information from user ID, cached for SLACK_METADATA_TTL seconds
     Returns a dictionary with all user details
     """
+    return user_cache.get_or_load(user_id, lambda: fetch_user_info(user_id))
+
+
+def fetch_user_info(user_id):
+    """
+    Get full user information from user ID using users.info
+    """
     try:
         result = app.client.users_info(user=user_id)
         if result["ok"]:
             return result["user"]
         else:
-            logger.error(f"Error getting user info: {result['error']}")
+            app.logger.error(f"Error getting user info: {result['error']}")
             return None
     except Exception as e:
-        logger.error(f"Exception getting user info: {e}")
+        app.logger.error(f"Exception getting user info: {e}")
         return None
 
 
+def warm_up_metadata_cache():
+    """
+    Fill the user and channel caches with users.list and conversations.list,
+    a handful of paginated calls instead of one call per user or channel.
+    """
+    try:
+        for page in app.client.users_list(limit=200):
+            for user in page["members"]:
+                user_cache.set(user["id"], user)
+        for page in app.client.conversations_list(types="public_channel,private_channel", exclude_archived=True, limit=200):
+            for channel in page["channels"]:
+                channel_cache.set(channel["id"], channel["name"])
+        print("Metadata cache warmed up")
+    except Exception as e:
+        app.logger.error(f"Exception warming up metadata cache: {e}")
+
+
 # Event handlers for various Slack events
+@app.event("user_change")
+def handle_user_change_events(event, logger):
+    # The event carries the updated user, so refresh the cache in place
+    user = event.get("user", {})
+    if user.get("id"):
+        user_cache.set(user["id"], user)
+        logger.info(f"User cache refreshed for {user['id']}")
+
+
+@app.event("channel_rename")
+@app.event("group_rename")
+def handle_channel_rename_events(event, logger):
+    channel = event.get("channel", {})
+    if channel.get("id"):
+        channel_cache.invalidate(channel["id"])
+        if channel.get("name"):
+            channel_cache.set(channel["id"], channel["name"])
+        logger.info(f"Channel cache refreshed for {channel['id']}")
+
+
 @app.event("dnd_updated_user")
 def handle_dnd_updated_user_events(body, logger):
     logger.info(f"DND Update Event: {body}")
@@ -94,11 +188,24 @@ def handle_dnd_updated_user_events(body, logger):
 def handle_member_joined_channel_events(body, logger):
     logger.info(f"Member Joined Channel Event: {body}")
 
+def run_in_background(func, *args):
+    """Hand LLM work to the executor so the listener returns right away."""
+    def run():
+        try:
+            func(*args)
+        except Exception as e:
+            app.logger.error(f"Background job {func.__name__} failed: {e}")
+    llm_executor.submit(run)
+
+
 @app.command("/rewrite")
 def handle_rewrite(ack, respond, command):
     ack()  
     print(command)  
-    text = command.get("text")
+    run_in_background(rewrite, respond, command.get("text"))
+
+
+def rewrite(respond, text):
     # event = body.get("event")
     # print(event)
     llm_client = llm.llm_client()
@@ -112,8 +219,63 @@ def handle_rewrite(ack, respond, command):
     
 
 
+def retry_after_seconds(e):
+    return int(e.response.headers.get("Retry-After", 1)) if e.response.status_code == 429 else 1
+
+
+def final_update(client, channel_id, ts, text, next_update):
+    """
+    Last edit of a streamed reply. Waits until the rate limit allows another edit,
+    then retries on errors, so the reply doesn't keep its trailing " ...".
+    Returns whether the edit went through.
+    """
+    for attempt in range(STREAM_FINAL_UPDATE_ATTEMPTS):
+        time.sleep(max(0.0, next_update - time.monotonic()))
+        try:
+            client.chat_update(channel=channel_id, ts=ts, text=text)
+            return True
+        except SlackApiError as e:
+            app.logger.error(f"Error finishing streamed reply (attempt {attempt + 1}): {e.response['error']}")
+            next_update = time.monotonic() + retry_after_seconds(e)
+    return False
+
+
+def stream_reply(client, channel_id, thread_id, text, history=None):
+    """
+    Post a reply right away and edit it as the LLM's answer streams in.
+    Edits are coalesced to one per SLACK_STREAM_UPDATE_INTERVAL seconds, and
+    postponed for Retry-After seconds if Slack rate limits us. The final edit
+    waits out that interval too and is retried.
+    """
+    reply = client.chat_postMessage(channel=channel_id, thread_ts=thread_id, text=":hourglass_flowing_sand:")
+    answer = ""
+    shown = ""
+    next_update = 0.0
+    try:
+        for delta in llm.chat_stream(llm.llm_client(), text, history):
+            answer += delta
+            if time.monotonic() < next_update or answer == shown:
+                continue
+            try:
+                client.chat_update(channel=channel_id, ts=reply["ts"], text=answer + " ...")
+                shown = answer
+                next_update = time.monotonic() + STREAM_UPDATE_INTERVAL
+            except SlackApiError as e:
+                app.logger.error(f"Error updating streamed reply: {e.response['error']}")
+                next_update = time.monotonic() + retry_after_seconds(e)
+    except Exception:
+        # Never leave the hourglass or a half answer ending in " ..." behind.
+        # The error is raised again, so the partial answer isn't stored as a complete one.
+        note = "_Sorry, something went wrong while answering, please try again._"
+        final_update(client, channel_id, reply["ts"], f"{answer}\n\n{note}" if answer else note, next_update)
+        raise
+    # The answer is complete and gets stored even if Slack kept refusing the last edit
+    final_update(client, channel_id, reply["ts"], answer or "Sorry, I couldn't come up with an answer.", next_update)
+    return answer
+
+
 @app.event("app_mention")
-def mention_handler(body, say):
+def mention_handler(body, say, client):
     """Handle a bot mention event by responding with a message."""
     event = body.get("event", {})    
     user_id = event.get("user")
@@ -125,12 +287,29 @@ def mention_handler(body, say):
     print(event)
     channel_id = event.get("channel")
     thread_id = event.get("thread_ts") or event.get("ts")
-    
+    run_in_background(answer_mention, client, say, channel_id, thread_id, text)
+
+
+def answer_mention(client, say, channel_id, thread_id, text):
+    # Earlier turns of this thread, without a conversations.replies call
+    conversation_key = f"{channel_id}:{thread_id}"
+    history = conversations.history(conversation_key)
+
+    if LLM_STREAM:
+        print(f"User query: {text}, streaming reply in thread {thread_id}")
+        response = stream_reply(client, channel_id, thread_id, text, history)
+        pprint.pp(response)
+        conversations.append(conversation_key, "user", text)
+        conversations.append(conversation_key, "assistant", response)
+        return
+
     # Get LLM response
     llm_client = llm.llm_client()
     print(f"User query: {text}")
-    response = llm.chat(llm_client, text)
+    response = llm.chat(llm_client, text, history)
     pprint.pp(response)
+    conversations.append(conversation_key, "user", text)
+    conversations.append(conversation_key, "assistant", response)
     
     # Reply in thread if the mention was in a thread, otherwise reply normally
     if thread_id:
@@ -213,6 +392,9 @@ if __name__ == "__main__":
     print("Starting Slack bot with SocketMode...")
     print("Waiting for message events to arrive...")
     
+    if WARM_METADATA_CACHE:
+        warm_up_metadata_cache()
+
     # Create an app-level token with connections:write scope
     handler = SocketModeHandler(app, SLACK_APP_TOKEN)
     
@@ -225,3 +407,7 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"\nError starting bot: {e}")
         sys.exit(1)
+    finally:
+        llm_executor.shutdown(wait=False)
+        llm.close_client()
+        conversations.close()
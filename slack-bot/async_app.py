@@ -0,0 +1,202 @@
+import os
+import sys
+import asyncio
+from collections import OrderedDict, deque
+from slack_bolt.async_app import AsyncApp
+from slack_bolt import BoltResponse
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+from dotenv import load_dotenv
+import llm
+from memory import ConversationStore
+from cache import SeenSet, event_key
+
+# Load environment variables
+load_dotenv()
+
+# Get tokens from environment
+SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
+SLACK_APP_TOKEN = os.getenv("SLACK_APP_TOKEN")
+
+# Validate required environment variables
+if not SLACK_BOT_TOKEN:
+    print("Error: SLACK_BOT_TOKEN environment variable is not set")
+    sys.exit(1)
+
+if not SLACK_APP_TOKEN:
+    print("Error: SLACK_APP_TOKEN environment variable is not set")
+    sys.exit(1)
+
+# Completions running at once, and requests allowed to wait for a free slot
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "100"))
+
+EVENT_DEDUP_WINDOW = int(os.getenv("SLACK_EVENT_DEDUP_WINDOW", "600"))
+
+PLACEHOLDER_TEXT = "Working on it..."
+BUSY_TEXT = "I'm handling a lot of requests right now, please try again in a minute."
+ERROR_TEXT = "Sorry, something went wrong while answering, please try again."
+
+conversations = ConversationStore(
+    token_budget=int(os.getenv("CONVERSATION_TOKEN_BUDGET", "2000")),
+    max_threads=int(os.getenv("CONVERSATION_MAX_THREADS", "1000")),
+    ttl=int(os.getenv("CONVERSATION_TTL", "86400")),
+    db_path=os.getenv("CONVERSATION_DB") or None
+)
+
+app = AsyncApp(
+    token=SLACK_BOT_TOKEN
+)
+
+seen_events = SeenSet(window=EVENT_DEDUP_WINDOW)
+
+
+@app.middleware
+async def skip_duplicate_events(body, next, logger):
+    """Acknowledge redelivered events without running their listeners again."""
+    key = event_key(body)
+    if key is not None and not seen_events.add(key):
+        logger.info(f"Skipping duplicate event {key}")
+        return BoltResponse(status=200, body="")
+    await next()
+
+
+class FairQueue:
+    """
+    Queue of LLM jobs served round-robin across channels,
+    so one busy channel cannot starve the others.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.size = 0
+        self.channels = OrderedDict()
+        self.available = asyncio.Condition()
+
+    async def put(self, channel_id, job):
+        """Queue a job, returns False when the queue is full."""
+        async with self.available:
+            if self.size >= self.maxsize:
+                return False
+            self.channels.setdefault(channel_id, deque()).append(job)
+            self.size += 1
+            self.available.notify()
+            return True
+
+    async def get(self):
+        async with self.available:
+            await self.available.wait_for(lambda: self.size > 0)
+            channel_id, jobs = self.channels.popitem(last=False)
+            job = jobs.popleft()
+            if jobs:
+                # Back of the line for this channel's next job
+                self.channels[channel_id] = jobs
+            self.size -= 1
+            return job
+
+
+# Created in main(), so its Condition belongs to the loop asyncio.run starts
+jobs = None
+
+
+async def run_jobs(jobs):
+    """Run queued jobs, never more than LLM_CONCURRENCY at a time."""
+    slots = asyncio.Semaphore(LLM_CONCURRENCY)
+    running = set()
+
+    async def run(job):
+        try:
+            await job()
+        except Exception as e:
+            app.logger.error(f"LLM job failed: {e}")
+        finally:
+            slots.release()
+
+    while True:
+        await slots.acquire()
+        job = await jobs.get()
+        task = asyncio.create_task(run(job))
+        running.add(task)
+        task.add_done_callback(running.discard)
+
+
+@app.command("/rewrite")
+async def handle_rewrite(ack, respond, command):
+    await ack()
+    text = command.get("text")
+    print(f"User query: {text}")
+    query = f"Improve writing and correct grammar in the following text and do not add anything else in the response: {text}"
+
+    async def job():
+        try:
+            response = await llm.achat(llm.async_llm_client(), query)
+            await respond(response)
+        except Exception as e:
+            app.logger.error(f"Rewrite failed: {e}")
+            await respond(ERROR_TEXT)
+
+    if not await jobs.put(command.get("channel_id"), job):
+        await respond(BUSY_TEXT)
+
+
+@app.event("app_mention")
+async def mention_handler(body, say, client):
+    """Post a placeholder right away, then edit it with the LLM's answer once a worker is free."""
+    event = body.get("event", {})
+    text = event.get("text")
+    if '>' in text:
+        text = text.split('>', 1)[1].strip()
+
+    channel_id = event.get("channel")
+    thread_id = event.get("thread_ts") or event.get("ts")
+    print(f"User query: {text}")
+
+    placeholder = await say(PLACEHOLDER_TEXT, thread_ts=thread_id)
+
+    conversation_key = f"{channel_id}:{thread_id}"
+
+    async def job():
+        try:
+            # The store may commit to SQLite, which would block the event loop
+            history = await asyncio.to_thread(conversations.history, conversation_key)
+            response = await llm.achat(llm.async_llm_client(), text, history)
+            await client.chat_update(channel=channel_id, ts=placeholder["ts"], text=response)
+        except Exception as e:
+            # Replace the placeholder, so the thread doesn't say "Working on it..." forever
+            app.logger.error(f"Answering mention failed: {e}")
+            await client.chat_update(channel=channel_id, ts=placeholder["ts"], text=ERROR_TEXT)
+            return
+        await asyncio.to_thread(conversations.append, conversation_key, "user", text)
+        await asyncio.to_thread(conversations.append, conversation_key, "assistant", response)
+
+    if not await jobs.put(channel_id, job):
+        await client.chat_update(channel=channel_id, ts=placeholder["ts"], text=BUSY_TEXT)
+
+
+@app.event("message")
+async def handle_message_events(body, logger):
+    logger.debug(f"Message event: {body.get('event', {}).get('ts')}")
+
+
+async def main():
+    global jobs
+    jobs = FairQueue(LLM_QUEUE_SIZE)
+    print("Starting async Slack bot with SocketMode...")
+    print(f"Running up to {LLM_CONCURRENCY} completions at once, queueing up to {LLM_QUEUE_SIZE}")
+    runner = asyncio.create_task(run_jobs(jobs))
+    handler = AsyncSocketModeHandler(app, SLACK_APP_TOKEN)
+    try:
+        await handler.start_async()
+    finally:
+        runner.cancel()
+        await llm.async_llm_client().close()
+        conversations.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nBot stopped by user.")
+    except Exception as e:
+        print(f"\nError starting bot: {e}")
+        sys.exit(1)
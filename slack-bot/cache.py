@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe cache whose entries expire after `ttl` seconds.
+    Concurrent misses for the same key are deduplicated: the first caller runs
+    the loader and the others wait for its result instead of repeating the call.
+    """
+
+    def __init__(self, ttl=3600, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._entries) >= self.maxsize and key not in self._entries:
+                self._evict()
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, or call loader() to fetch it.
+        None results are not cached, so failed lookups are retried next time.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                inflight = self._inflight[key] = {"done": threading.Event(), "value": None}
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            inflight["done"].wait()
+            return inflight["value"]
+
+        try:
+            value = loader()
+            inflight["value"] = value
+            if value is not None:
+                self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            inflight["done"].set()
+
+    def _evict(self):
+        # Drop expired entries first, then the ones closest to expiry
+        now = time.monotonic()
+        expired = [key for key, (_, expires) in self._entries.items() if expires <= now]
+        for key in expired:
+            del self._entries[key]
+        if len(self._entries) >= self.maxsize:
+            oldest = sorted(self._entries, key=lambda k: self._entries[k][1])[:max(1, self.maxsize // 10)]
+            for key in oldest:
+                del self._entries[key]
+
+
+def event_key(body):
+    """
+    Identify a Slack event across redeliveries: event_id when Slack sends one,
+    otherwise the event type and client_msg_id.
+    """
+    if body.get("event_id"):
+        return body["event_id"]
+    event = body.get("event", {})
+    if event.get("client_msg_id"):
+        return f"{event.get('type')}:{event['client_msg_id']}"
+    return None
+
+
+class SeenSet:
+    """
+    Keys seen in the last `window` seconds, bounded to `maxsize` entries.
+    Used to recognise events that Slack redelivers.
+    """
+
+    def __init__(self, window=600, maxsize=10000):
+        self.window = window
+        self.maxsize = maxsize
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key):
+        """Remember key, returns False if it was already seen within the window."""
+        now = time.monotonic()
+        with self._lock:
+            # Keys are kept in insertion order, so expired ones are at the front
+            while self._seen and next(iter(self._seen.values())) <= now - self.window:
+                self._seen.popitem(last=False)
+            if key in self._seen:
+                return False
+            self._seen[key] = now
+            if len(self._seen) > self.maxsize:
+                self._seen.popitem(last=False)
+            return True
@@ -1,6 +1,8 @@
 import openai
+import httpx
 import os
 import sys
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,6 +12,13 @@ LLM_ENDPOINT = os.getenv("LLM_ENDPOINT")
 LLM_API_KEY = os.getenv("LLM_API_KEY")
 LLM_MODEL = os.getenv("LLM_MODEL")
 
+# Connection pool, timeout and retry settings of the shared client
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+
 # Validate required environment variables
 if not LLM_ENDPOINT:
     print("Error: SLACK_BOT_TOKEN environment variable is not set")
@@ -19,17 +28,69 @@ if not LLM_API_KEY:
     print("Error: SLACK_APP_TOKEN environment variable is not set")
     sys.exit(1)
 
-def llm_client():
-    client = openai.OpenAI(
-        api_key=LLM_API_KEY,
-        base_url=LLM_ENDPOINT 
+_client = None
+_client_lock = threading.Lock()
+_async_client = None
+
+
+def _pool_limits():
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY
     )
-    return client
 
-def chat(client,text):
+
+def llm_client():
+    """
+    Return the process-wide LLM client, creating it on first use.
+    Its keep-alive connection pool is shared by every handler thread, so a mention
+    reuses an open connection instead of paying for a new TLS handshake.
+    Failed requests (connection errors, 429 and 5xx) are retried by the openai
+    client with exponential backoff, honouring Retry-After.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = openai.OpenAI(
+                    api_key=LLM_API_KEY,
+                    base_url=LLM_ENDPOINT,
+                    timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                    max_retries=LLM_MAX_RETRIES,
+                    http_client=openai.DefaultHttpxClient(limits=_pool_limits())
+                )
+    return _client
+
+
+def async_llm_client():
+    """
+    Return the process-wide async LLM client for the asyncio bot,
+    with the same connection pool, timeout and retry settings.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = openai.AsyncOpenAI(
+            api_key=LLM_API_KEY,
+            base_url=LLM_ENDPOINT,
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            max_retries=LLM_MAX_RETRIES,
+            http_client=openai.DefaultAsyncHttpxClient(limits=_pool_limits())
+        )
+    return _async_client
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+def chat(client,text, history=None):
     response = client.chat.completions.create(
         model=LLM_MODEL, # model to send to the proxy
-        messages = [
+        messages = (history or []) + [
             {
                 "role": "user",
                 "content": text
@@ -39,3 +100,36 @@ def chat(client,text):
     response = response.to_dict()
     response = response["choices"][0]["message"]["content"]
     return response
+
+
+async def achat(client, text, history=None):
+    response = await client.chat.completions.create(
+        model=LLM_MODEL, # model to send to the proxy
+        messages = (history or []) + [
+            {
+                "role": "user",
+                "content": text
+            }
+        ]
+    )
+    response = response.to_dict()
+    response = response["choices"][0]["message"]["content"]
+    return response
+
+
+def chat_stream(client, text, history=None):
+    """Yield the answer's text as it is generated."""
+    stream = client.chat.completions.create(
+        model=LLM_MODEL, # model to send to the proxy
+        messages = (history or []) + [
+            {
+                "role": "user",
+                "content": text
+            }
+        ],
+        stream=True
+    )
+    for chunk in stream:
+        # Some providers send chunks without choices, e.g. content filter results
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
@@ -0,0 +1,268 @@
+"""
+Load-test harness for the Slack bot.
+
+Replays synthetic app_mention, message and /rewrite payloads into the Bolt app
+in app.py, against local stub servers for the Slack Web API and the
+OpenAI-compatible LLM endpoint, and reports throughput, latency percentiles
+and API call counts per event type.
+
+    python loadtest.py --events 200 --concurrency 20 --slack-latency-ms 50 --llm-latency-ms 800
+"""
+import os
+import io
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import contextlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class Stats:
+    """Counters and completion times shared by the stub servers and the replay loop."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.api_calls = Counter()
+            self.replies = {}
+            self.all_replied = threading.Event()
+            self.expected = set()
+
+    def count(self, name):
+        with self.lock:
+            self.api_calls[name] += 1
+            self.last_call = time.perf_counter()
+
+    def wait_until_quiet(self, quiet):
+        """Wait until no API call has been made for `quiet` seconds, returns the time of the last one."""
+        while True:
+            with self.lock:
+                last_call = getattr(self, "last_call", 0.0)
+            if time.perf_counter() - last_call >= quiet:
+                return last_call
+            time.sleep(quiet / 4)
+
+    def replied(self, key):
+        # First reply wins, so streamed replies measure time to the first visible message
+        with self.lock:
+            if key in self.expected and key not in self.replies:
+                self.replies[key] = time.perf_counter()
+                if len(self.replies) == len(self.expected):
+                    self.all_replied.set()
+
+
+stats = Stats()
+
+
+def stub_handler(latency_ms, handle):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length).decode("utf-8")
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                body = json.loads(raw or "{}")
+            else:
+                body = {key: values[0] for key, values in parse_qs(raw).items()}
+            time.sleep(latency_ms / 1000)
+            status, content_type, payload = handle(self.path, body)
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def slack_api(path, body):
+    """Minimal Slack Web API: every method succeeds with just enough data for the bot."""
+    if path.startswith("/response/"):
+        stats.count("response_url")
+        stats.replied(path.rsplit("/", 1)[1])
+        return 200, "text/plain", b"ok"
+
+    method = path.rsplit("/", 1)[1]
+    stats.count(method)
+    result = {"ok": True}
+    if method == "auth.test":
+        result.update(user_id="UBOT", bot_id="BBOT", team_id="T0001", team="loadtest", user="bot")
+    elif method == "conversations.info":
+        result["channel"] = {"id": body.get("channel"), "name": f"channel-{body.get('channel')}"}
+    elif method == "users.info":
+        result["user"] = {"id": body.get("user"), "name": f"user-{body.get('user')}", "profile": {}}
+    elif method == "users.list":
+        result.update(members=[], response_metadata={"next_cursor": ""})
+    elif method == "conversations.list":
+        result.update(channels=[], response_metadata={"next_cursor": ""})
+    elif method == "chat.postMessage":
+        result["ts"] = f"{time.time():.6f}"
+        stats.replied(body.get("thread_ts"))
+    elif method == "chat.update":
+        result["ts"] = body.get("ts")
+    return 200, "application/json", json.dumps(result).encode("utf-8")
+
+
+def llm_api(path, body):
+    """Minimal OpenAI-compatible chat completions endpoint, streaming or not."""
+    stats.count("chat.completions")
+    answer = "This is a stub answer from the load-test LLM. It has two sentences."
+    if not body.get("stream"):
+        completion = {
+            "id": "chatcmpl-loadtest", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": answer}}],
+        }
+        return 200, "application/json", json.dumps(completion).encode("utf-8")
+
+    chunks = []
+    for word in answer.split(" "):
+        chunk = {
+            "id": "chatcmpl-loadtest", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model"),
+            "choices": [{"index": 0, "finish_reason": None, "delta": {"content": word + " "}}],
+        }
+        chunks.append(f"data: {json.dumps(chunk)}\n\n")
+    chunks.append("data: [DONE]\n\n")
+    return 200, "text/event-stream", "".join(chunks).encode("utf-8")
+
+
+def start_server(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def make_payload(event_type, index, slack_url, users, channels):
+    """Build a Socket Mode payload, returns it with the key its reply will carry (None if no reply)."""
+    user = f"U{random.randrange(users):04d}"
+    channel = f"C{random.randrange(channels):04d}"
+    ts = f"{time.time():.6f}{index:06d}"
+    if event_type == "rewrite":
+        key = uuid.uuid4().hex
+        return {
+            "command": "/rewrite", "text": "this sentense has a few mistake in it",
+            "user_id": user, "channel_id": channel, "team_id": "T0001",
+            "response_url": f"{slack_url}/response/{key}", "trigger_id": key,
+        }, key
+
+    event = {"type": event_type, "user": user, "channel": channel, "ts": ts,
+             "client_msg_id": str(uuid.uuid4()), "text": "<@UBOT> what is the capital of France?"}
+    if event_type == "message":
+        event["text"] = "just chatting in the channel"
+    payload = {
+        "type": "event_callback", "team_id": "T0001", "api_app_id": "A0001",
+        "event_id": f"Ev{uuid.uuid4().hex[:10].upper()}", "event_time": int(time.time()), "event": event,
+    }
+    return payload, ts if event_type == "app_mention" else None
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+
+def run_phase(bolt_app, event_type, args, slack_url):
+    from slack_bolt import BoltRequest
+
+    stats.reset()
+    payloads = [make_payload(event_type, i, slack_url, args.users, args.channels) for i in range(args.events)]
+    # Redeliver some events, as Slack does when an ack is slow; they should not cause extra work.
+    # Slash commands are not retried by Slack, so they are never redelivered.
+    if event_type != "rewrite":
+        payloads += random.sample(payloads, int(len(payloads) * args.redeliver))
+    random.shuffle(payloads)
+    sent = {}
+    ack_latencies = []
+    lock = threading.Lock()
+    with stats.lock:
+        stats.expected = {key for _, key in payloads if key}
+        if not stats.expected:
+            stats.all_replied.set()
+
+    def replay(item):
+        payload, key = item
+        start = time.perf_counter()
+        if key:
+            with lock:
+                sent[key] = start
+        response = bolt_app.dispatch(BoltRequest(body=payload, mode="socket_mode"))
+        with lock:
+            ack_latencies.append(time.perf_counter() - start)
+        return response.status
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            statuses = Counter(executor.map(replay, payloads))
+        stats.all_replied.wait(args.timeout)
+        # Listeners without a reply (e.g. message logging) finish in the background
+        last_call = stats.wait_until_quiet(max(0.5, 5 * args.slack_latency_ms / 1000))
+    elapsed = max(last_call, max(stats.replies.values(), default=0.0)) - start
+    if elapsed <= 0:
+        elapsed = time.perf_counter() - start
+
+    with stats.lock:
+        replies = dict(stats.replies)
+        api_calls = dict(stats.api_calls)
+    reply_latencies = [replies[key] - sent[key] for key in replies if key in sent]
+
+    print(f"\n== {event_type}: {args.events} events, {len(payloads) - args.events} redelivered, concurrency {args.concurrency}")
+    print(f"throughput       {args.events / elapsed:.1f} events/s over {elapsed:.2f}s")
+    print(f"ack statuses     {dict(statuses)}")
+    print("ack latency      " + ", ".join(f"p{p} {percentile(ack_latencies, p) * 1000:.0f}ms" for p in (50, 95, 99)))
+    if stats.expected:
+        print(f"replies          {len(replies)} / {len(stats.expected)}")
+        print("reply latency    " + ", ".join(f"p{p} {percentile(reply_latencies, p) * 1000:.0f}ms" for p in (50, 95, 99)))
+    print("api calls        " + ", ".join(f"{name}={count}" for name, count in sorted(api_calls.items())))
+    print("calls per event  " + f"{sum(api_calls.values()) / args.events:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay synthetic Slack events into the bot against local stub servers")
+    parser.add_argument("--events", type=int, default=100, help="Events replayed per event type")
+    parser.add_argument("--concurrency", type=int, default=10, help="Events dispatched at once")
+    parser.add_argument("--types", default="app_mention,message,rewrite", help="Comma separated event types to replay")
+    parser.add_argument("--slack-latency-ms", type=int, default=50, help="Latency of every stub Slack Web API call")
+    parser.add_argument("--llm-latency-ms", type=int, default=500, help="Latency of every stub LLM completion")
+    parser.add_argument("--users", type=int, default=50, help="Distinct users in the synthetic events")
+    parser.add_argument("--channels", type=int, default=10, help="Distinct channels in the synthetic events")
+    parser.add_argument("--redeliver", type=float, default=0.0, help="Fraction of app_mention and message events dispatched a second time")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for replies per event type")
+    args = parser.parse_args()
+
+    _, slack_url = start_server(stub_handler(args.slack_latency_ms, slack_api))
+    _, llm_url = start_server(stub_handler(args.llm_latency_ms, llm_api))
+
+    # The bot reads its configuration at import time
+    os.environ.update({
+        "SLACK_BOT_TOKEN": "xoxb-loadtest", "SLACK_APP_TOKEN": "xapp-loadtest",
+        "SLACK_API_URL": f"{slack_url}/api/",
+        "LLM_ENDPOINT": llm_url, "LLM_API_KEY": "loadtest", "LLM_MODEL": "loadtest",
+    })
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as bot
+
+    for event_type in args.types.split(","):
+        run_phase(bot.app, event_type, args, slack_url)
+
+    bot.llm_executor.shutdown(wait=False)
+    bot.llm.close_client()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# tiktoken is optional, without it tokens are estimated from the text length
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+
+def count_tokens(text):
+    if _encoding is None:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text))
+
+
+class ConversationStore:
+    """
+    Recent turns of each Slack thread, so follow-ups get context without
+    calling conversations.replies.
+    A thread keeps its newest turns that fit in token_budget. Threads idle for
+    longer than ttl seconds, or beyond max_threads (least recently used first),
+    are evicted. With db_path the threads are also saved to SQLite and
+    reloaded after a restart.
+    """
+
+    def __init__(self, token_budget=2000, max_threads=1000, ttl=24 * 3600, db_path=None):
+        self.token_budget = token_budget
+        self.max_threads = max_threads
+        self.ttl = ttl
+        self._threads = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS threads (key TEXT PRIMARY KEY, messages TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM threads WHERE updated < ?", (time.time() - ttl,))
+            self._db.commit()
+
+    def history(self, key):
+        """Return the stored messages of a thread, oldest first."""
+        with self._lock:
+            thread = self._load(key)
+            if thread is None:
+                return []
+            return list(thread["messages"])
+
+    def append(self, key, role, content):
+        with self._lock:
+            thread = self._load(key) or {"messages": [], "updated": 0.0}
+            thread["messages"].append({"role": role, "content": content})
+            # Drop the oldest turns until the thread fits in the budget, keeping at least the newest one
+            while len(thread["messages"]) > 1 and \
+                    sum(count_tokens(m["content"]) for m in thread["messages"]) > self.token_budget:
+                thread["messages"].pop(0)
+            thread["updated"] = time.time()
+            self._remember(key, thread)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO threads (key, messages, updated) VALUES (?, ?, ?)",
+                    (key, json.dumps(thread["messages"]), thread["updated"])
+                )
+                self._db.commit()
+
+    def _load(self, key):
+        thread = self._threads.get(key)
+        if thread is None and self._db is not None:
+            row = self._db.execute("SELECT messages, updated FROM threads WHERE key = ?", (key,)).fetchone()
+            if row:
+                thread = {"messages": json.loads(row[0]), "updated": row[1]}
+                self._remember(key, thread)
+        if thread is None:
+            return None
+        if thread["updated"] < time.time() - self.ttl:
+            self._threads.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM threads WHERE key = ?", (key,))
+                self._db.commit()
+            return None
+        self._threads.move_to_end(key)
+        return thread
+
+    def _remember(self, key, thread):
+        self._threads[key] = thread
+        self._threads.move_to_end(key)
+        while len(self._threads) > self.max_threads:
+            self._threads.popitem(last=False)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -1,12 +1,20 @@
 import os
+import re
 import json
+import time
+import sqlite3
+import threading
 import spotipy
+import requests
 import logging
 import argparse
 import pprint
 from openai import AzureOpenAI, OpenAIError, AuthenticationError, APIConnectionError, APITimeoutError, BadRequestError
 from dotenv import load_dotenv
 from spotipy.oauth2 import SpotifyClientCredentials
+from spotipy.exceptions import SpotifyException
+from concurrent.futures import ThreadPoolExecutor
+from urllib3.util.retry import Retry
 
 load_dotenv()
 
@@ -24,27 +32,327 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-def get_song_list_spotify(playlist_name, generated_playlist_dict):
-    oauth_object = spotipy.SpotifyOAuth(scope='playlist-modify-private')
-    token_dict = oauth_object.get_access_token()
-    token = token_dict['access_token']
-    spotifyObject = spotipy.Spotify(auth=token)
-    user_name = spotifyObject.current_user()
-    user_id = user_name["id"]
+# Spotify searches running at once, and how often a rate-limited call is retried
+SEARCH_WORKERS = int(os.getenv("SPOTIFY_SEARCH_WORKERS", "8"))
+SPOTIFY_MAX_RETRIES = int(os.getenv("SPOTIFY_MAX_RETRIES", "5"))
+
+# Seconds before expiry the access token is refreshed
+TOKEN_REFRESH_MARGIN = int(os.getenv("SPOTIFY_TOKEN_REFRESH_MARGIN", "300"))
+
+# Spotify accepts at most 100 tracks per add request
+PLAYLIST_CHUNK_SIZE = 100
+
+# Songs asked for in one completion; bigger playlists are generated by several completions in parallel
+SONGS_PER_CALL = int(os.getenv("LLM_SONGS_PER_CALL", "50"))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "4"))
+# Extra rounds of completions to make up for duplicate songs
+GENERATION_ROUNDS = 3
+
+PLAYLIST_PROMPT = """
+            You are spotify playlist generator. I will provide you with a mood or situation or event or even a artist/album name. You will have to generate a playlist for me. The playlist should be in a python-valid JSON.
+            In the prompt, user will provide description of the playlist, or it can include an event or a artist name as well.
+            Thr prompt will also include the number of songs that needs to be added, and the language of the songs. The language can be hindi or english.
+            If the language picked is hindi, then pick songs in Hindi language i.e. songs from bollywood i.e. songs created in India.
+            for each track, include, name of the artist and name of the song. Also generate a nice name for the playlist.           
+            Exmaple format:
+            ```json
+            {
+                "PLAYLIST_NAME" : "NAME OF THE PLAYLIST",
+                "1" :
+                {
+                    artist : <ARTIST_NAME>
+                    song : <SONG NAME>
+                },
+                "2": 
+                {
+                    artist : <ARTIST_NAME>
+                    song :   <SONG NAME>
+                }, 
+                "3": {
+                    artist : <ARTIST_NAME>
+                    song :   <SONG NAME>
+                }
+            }```        
+            """
+
+# Local cache of search results; misses are kept for a shorter time in case the track shows up later
+SEARCH_CACHE_PATH = os.getenv("SPOTIFY_SEARCH_CACHE", "search_cache.db")
+SEARCH_CACHE_TTL = int(os.getenv("SPOTIFY_SEARCH_CACHE_TTL", str(30 * 24 * 3600)))
+SEARCH_MISS_TTL = int(os.getenv("SPOTIFY_SEARCH_MISS_TTL", str(24 * 3600)))
+
+
+class TokenManager:
+    """
+    Spotify auth manager that keeps the access token in memory, so the token cache
+    file is read once per process instead of once per request. The token is
+    refreshed in the background before it expires, and the user id is looked up once.
+    """
+
+    def __init__(self, oauth, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.oauth = oauth
+        self.refresh_margin = refresh_margin
+        self.lock = threading.Lock()
+        self.token_info = None
+        self.timer = None
+        self._user_id = None
+
+    def get_access_token(self, as_dict=False):
+        with self.lock:
+            if self.token_info is None or self.token_info["expires_at"] - time.time() < self.refresh_margin:
+                self._refresh()
+            return dict(self.token_info) if as_dict else self.token_info["access_token"]
+
+    def _refresh(self):
+        if self.token_info is None:
+            # Token from the cache file (refreshed if it expired), or the browser login on first use
+            self.oauth.get_access_token(as_dict=False)
+            self.token_info = self.oauth.get_cached_token()
+        else:
+            self.token_info = self.oauth.refresh_access_token(self.token_info["refresh_token"])
+            logger.info("Refreshed Spotify access token")
+        self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        # Refresh ahead of get_access_token, so requests don't wait for it
+        delay = max(self.token_info["expires_at"] - time.time() - 2 * self.refresh_margin, 0)
+        self.timer = threading.Timer(delay, self._background_refresh)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _background_refresh(self):
+        with self.lock:
+            try:
+                self._refresh()
+            except Exception as e:
+                # get_access_token refreshes it on demand instead
+                logger.info(f"Background token refresh failed: {e}")
+
+    def user_id(self, spotifyObject):
+        with self.lock:
+            user_id = self._user_id
+        if user_id is None:
+            user_id = spotifyObject.current_user()["id"]
+            with self.lock:
+                self._user_id = user_id
+        return user_id
+
+    def close(self):
+        if self.timer is not None:
+            self.timer.cancel()
+
+
+def spotify_requests_session():
+    """
+    HTTP session for spotipy that only retries connection errors. Rate limits (429) and
+    server errors (5xx) are raised straight to spotify_call, so the shared back-off sees
+    the first 429 instead of urllib3 sleeping through Retry-After in every worker.
+    """
+    retry = Retry(total=3, read=False, status_forcelist=(), respect_retry_after_header=False,
+                  backoff_factor=0.3, allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']))
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+_spotify_session = None
+_spotify_session_lock = threading.Lock()
+
+
+def spotify_session():
+    """Returns the process's Spotify client and its TokenManager, creating them on first use."""
+    global _spotify_session
+    with _spotify_session_lock:
+        if _spotify_session is None:
+            tokens = TokenManager(spotipy.SpotifyOAuth(scope='playlist-modify-private'))
+            spotifyObject = spotipy.Spotify(auth_manager=tokens, requests_session=spotify_requests_session())
+            _spotify_session = (spotifyObject, tokens)
+        return _spotify_session
+
+
+class RateLimit:
+    """
+    Shared back-off for the search workers: when Spotify answers 429, every worker
+    waits for the Retry-After period instead of each one hitting the limit again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.resume_at = 0.0
+
+    def wait(self):
+        with self.lock:
+            delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+
+# Shared by every search and write in the process, including concurrent playlists in batch mode
+spotify_rate_limit = RateLimit()
+
+
+def spotify_call(call, rate_limit):
+    """
+    Run a Spotify API call. When it is rate limited every worker waits for the Retry-After
+    period before it is retried; server errors are retried with exponential back-off.
+    """
+    for attempt in range(SPOTIFY_MAX_RETRIES + 1):
+        rate_limit.wait()
+        try:
+            return call()
+        except SpotifyException as e:
+            retryable = e.http_status == 429 or e.http_status >= 500
+            if not retryable or attempt == SPOTIFY_MAX_RETRIES:
+                raise
+            if e.http_status == 429:
+                retry_after = int((e.headers or {}).get("Retry-After", 2 ** attempt))
+                logger.info(f"Rate limited by Spotify, retrying in {retry_after}s")
+                rate_limit.pause(retry_after)
+            else:
+                logger.info(f"Spotify returned {e.http_status}, retrying in {2 ** attempt}s")
+                time.sleep(2 ** attempt)
+
+
+def spotify_search(spotifyObject, query, rate_limit):
+    return spotify_call(lambda: spotifyObject.search(q=query, limit=5, type="track"), rate_limit)
+
+
+def normalize(text):
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+class SearchCache:
+    """
+    SQLite cache of (song, artist) -> Spotify track, so songs the LLM suggests again
+    don't cost another search. Misses are stored too, with no track.
+    """
+
+    def __init__(self, path=SEARCH_CACHE_PATH, ttl=SEARCH_CACHE_TTL, miss_ttl=SEARCH_MISS_TTL):
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS searches (song TEXT, artist TEXT, name TEXT, uri TEXT, url TEXT, "
+            "updated REAL NOT NULL, PRIMARY KEY (song, artist))"
+        )
+        self.db.commit()
+
+    def get(self, song, artist):
+        """Returns (found, track); track is None for a cached miss."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT name, uri, url, updated FROM searches WHERE song = ? AND artist = ?",
+                (normalize(song), normalize(artist))
+            ).fetchone()
+        if row is None:
+            return False, None
+        name, uri, url, updated = row
+        if updated < time.time() - (self.ttl if uri else self.miss_ttl):
+            return False, None
+        return True, ({"name": name, "uri": uri, "url": url} if uri else None)
+
+    def set(self, song, artist, track):
+        track = track or {}
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO searches (song, artist, name, uri, url, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (normalize(song), normalize(artist), track.get("name"), track.get("uri"), track.get("url"), time.time())
+            )
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+def resolve_track(spotifyObject, track, rate_limit, cache=None):
+    """Find a generated track on Spotify, or in the search cache. Returns None when nothing matches."""
+    song, artist = track["song"], track["artist"]
+    if cache is not None:
+        found, cached = cache.get(song, artist)
+        if found:
+            logger.info(f"Search cache hit for: {song} by {artist}")
+            return cached
+    result = search_track(spotifyObject, song, artist, rate_limit)
+    if cache is not None:
+        cache.set(song, artist, result)
+    return result
+
+
+def search_track(spotifyObject, song, artist, rate_limit):
+    """Search for a track with a strict track and artist query first, and looser queries after it."""
+    queries = [
+        (f'track:"{song}" artist:"{artist}"', False),
+        (f"{song} {artist}", False),
+        # A search on the song name alone only counts if the artist matches
+        (f'track:"{song}"', True),
+    ]
+    for query, check_artist in queries:
+        items = spotify_search(spotifyObject, query, rate_limit)["tracks"]["items"]
+        for item in items:
+            if check_artist and not any(normalize(artist) in normalize(a["name"]) or normalize(a["name"]) in normalize(artist)
+                                        for a in item["artists"]):
+                continue
+            logger.info(f"Fetched song: {item['name']} for {song} by {artist}")
+            return {"name": item["name"], "uri": item["uri"], "url": item["external_urls"]["spotify"]}
+    logger.info(f"No match on Spotify for: {song} by {artist}")
+    return None
+
+
+def resolve_tracks(spotifyObject, tracks, cache=None):
+    """
+    Resolve the tracks concurrently, returns the matches in playlist order with misses
+    and tracks that resolve to an already matched song skipped.
+    """
+    tracks = list(tracks)
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+        results = list(executor.map(lambda track: resolve_track(spotifyObject, track, spotify_rate_limit, cache), tracks))
     songs = []
-    for track in generated_playlist_dict:    
-        logger.info(f"Searching for track: {track['song']}")
-        results = spotifyObject.search(q=f'track: {track["song"]}, artist: {track["artist"]}', limit=5, type="track" )
-        songs_dict = results['tracks']        
-        song_name = songs_dict['items'][0]['name']        
-        song_items = songs_dict['items']
-        song = song_items[0]['external_urls']['spotify']
-        songs.append(song)
-        logger.info(f"Fetched song: {song_name}")
-    
-    playlist = spotifyObject.user_playlist_create(user_id, playlist_name, public=False, collaborative=False, description="This playlist is generated through Generative AI.")            
-    spotifyObject.user_playlist_add_tracks(user_id, playlist["id"], songs)
+    uris = set()
+    for song in results:
+        if song and song["uri"] not in uris:
+            uris.add(song["uri"])
+            songs.append(song)
+    logger.info(f"Resolved {len(songs)} of {len(tracks)} tracks on Spotify")
+    return songs
+
+
+def add_tracks(spotifyObject, user_id, playlist_id, songs):
+    """Add the songs in chunks of PLAYLIST_CHUNK_SIZE, one chunk at a time so the playlist keeps their order."""
+    for start in range(0, len(songs), PLAYLIST_CHUNK_SIZE):
+        chunk = songs[start:start + PLAYLIST_CHUNK_SIZE]
+        spotify_call(lambda: spotifyObject.user_playlist_add_tracks(user_id, playlist_id, chunk), spotify_rate_limit)
+        logger.info(f"Added tracks {start + 1}-{start + len(chunk)} of {len(songs)}")
+
+
+def get_song_list_spotify(playlist_name, generated_playlist_dict, cache=None):
+    """Create the playlist on Spotify, returns its name, link and number of songs."""
+    spotifyObject, tokens = spotify_session()
+    user_id = tokens.user_id(spotifyObject)
+    own_cache = cache is None
+    if own_cache:
+        cache = SearchCache()
+    try:
+        songs = [song["uri"] for song in resolve_tracks(spotifyObject, generated_playlist_dict, cache)]
+    finally:
+        if own_cache:
+            cache.close()
+    if not songs:
+        logger.error("None of the generated songs were found on Spotify.")
+        logger.error("ABORTING")
+        exit(1)
+
+    playlist = spotify_call(lambda: spotifyObject.user_playlist_create(user_id, playlist_name, public=False, collaborative=False, description="This playlist is generated through Generative AI."), spotify_rate_limit)
+    add_tracks(spotifyObject, user_id, playlist["id"], songs)
     print(f"Playlist name: {playlist_name}, link: {playlist['external_urls']['spotify']}")
+    return {"playlist_name": playlist_name, "link": playlist['external_urls']['spotify'], "songs_added": len(songs)}
 
 
 def openai_chat(openai_client, messages, model="gpt-4o-mini"):
@@ -75,6 +383,128 @@ def openai_chat(openai_client, messages, model="gpt-4o-mini"):
         print("ABORTING...!!")
         exit(1)
 
+def playlist_messages(description, number, language, part=1, parts=1, exclude=()):
+    user_prompt = f"Generate a playlist with following description: {description}, it should have {number} songs and the language of songs should be {language}."
+    if parts > 1:
+        user_prompt += f" This is part {part} of {parts} of a bigger playlist, so pick songs the other parts are unlikely to have."
+    if exclude:
+        user_prompt += " Do not include any of these songs: " + "; ".join(exclude)
+    return [{"role": "system", "content" : PLAYLIST_PROMPT }, {"role": "user", "content": user_prompt}]
+
+
+def parse_playlist(generated_playlist):
+    """Returns the playlist name and its tracks from the LLM's JSON reply."""
+    generated_playlist = generated_playlist.replace("```json", "").replace("```","")
+    generated_playlist_dict = json.loads(generated_playlist)
+    playlist_name = generated_playlist_dict.pop("PLAYLIST_NAME", None)
+    tracks = [track for track in generated_playlist_dict.values()
+              if isinstance(track, dict) and track.get("song") and track.get("artist")]
+    return playlist_name, tracks
+
+
+def generate_playlist(openai_client, description, number, language, executor=None):
+    """
+    Generate a playlist of up to `number` songs. Each completion asks for at most
+    SONGS_PER_CALL songs and they run in parallel, on `executor` if given; duplicate
+    songs are dropped and made up for in another round.
+    """
+    playlist_name = None
+    tracks = {}
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=LLM_WORKERS)
+    try:
+        for generation in range(GENERATION_ROUNDS):
+            missing = number - len(tracks)
+            if missing <= 0:
+                break
+            sizes = [min(SONGS_PER_CALL, missing - start) for start in range(0, missing, SONGS_PER_CALL)]
+            # Later rounds are told which songs the playlist already has
+            exclude = [f"{track['song']} by {track['artist']}" for track in tracks.values()]
+            replies = executor.map(
+                lambda part: openai_chat(openai_client, playlist_messages(description, sizes[part], language, part + 1, len(sizes), exclude)),
+                range(len(sizes))
+            )
+            for reply in replies:
+                try:
+                    name, batch = parse_playlist(reply)
+                except json.decoder.JSONDecodeError as e:
+                    logger.info(f"Skipping a reply that is not valid JSON: {e}")
+                    continue
+                playlist_name = playlist_name or name
+                for track in batch:
+                    tracks.setdefault((normalize(track["song"]), normalize(track["artist"])), track)
+            logger.info(f"Generation round {generation + 1}: {len(tracks)} unique songs of {number}")
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return playlist_name, list(tracks.values())[:number]
+
+
+def create_playlist(openai_client, description, number, language, cache=None, llm_executor=None):
+    """Generate a playlist and create it on Spotify, returns its name, link, song counts and timings."""
+    started = time.perf_counter()
+    playlist_name, tracks = generate_playlist(openai_client, description, number, language, llm_executor)
+    generated = time.perf_counter()
+    if not tracks:
+        logger.error("The generated playlist has no songs.")
+        logger.error("ABORTING")
+        exit(1)
+    logger.info(f"Playlist JSON: {tracks}")
+    result = get_song_list_spotify(playlist_name or description, tracks, cache)
+    finished = time.perf_counter()
+    result.update(
+        songs_generated=len(tracks),
+        generate_seconds=round(generated - started, 3),
+        spotify_seconds=round(finished - generated, 3),
+        total_seconds=round(finished - started, 3)
+    )
+    return result
+
+
+def run_batch(openai_client, batch_path, output_path, concurrency, number, language):
+    """
+    Create a playlist for every line of a JSONL file, e.g. {"description": "...", "number": 20, "language": "english"},
+    `concurrency` at a time. The playlists share one Spotify session and search cache, and at most
+    `concurrency` completions run at once. Writes one JSON line with the result and timings of each playlist.
+    """
+    with open(batch_path) as f:
+        batch = [json.loads(line) for line in f if line.strip()]
+    logger.info(f"Batch of {len(batch)} playlists from {batch_path}")
+    cache = SearchCache()
+    write_lock = threading.Lock()
+    started = time.perf_counter()
+
+    def run(index, request):
+        result = {"index": index, "description": request.get("description")}
+        try:
+            if not request.get("description"):
+                raise ValueError("Description cannot be empty.")
+            result.update(create_playlist(
+                openai_client, request["description"], int(request.get("number", number)),
+                request.get("language", language), cache, llm_executor
+            ))
+        except (Exception, SystemExit) as e:
+            # openai_chat and get_song_list_spotify exit on errors, which only fails this playlist
+            result["error"] = str(e) if isinstance(e, Exception) else "Aborted, see logs/playlist_generator.log"
+            logger.info(f"Playlist {index} failed: {result['error']}")
+        with write_lock:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+        return result
+
+    try:
+        with open(output_path, "w") as output, \
+                ThreadPoolExecutor(max_workers=concurrency) as llm_executor, \
+                ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(run, range(len(batch)), batch))
+    finally:
+        cache.close()
+
+    failed = sum(1 for result in results if "error" in result)
+    print(f"Created {len(results) - failed} of {len(results)} playlists in {time.perf_counter() - started:.1f}s, results in {output_path}")
+
+
 def openai_auth(API_KEY, API_ENDPOINT):
     try:        
         openai_client = AzureOpenAI(
@@ -105,71 +535,53 @@ def openai_auth(API_KEY, API_ENDPOINT):
         exit(1)
 
 
-if __name__ == "__main__":    
-    try:
+def parse_args():
+    parser = argparse.ArgumentParser(
+                prog='Spotify Playlist Generator',
+                description="Based on the description provided by the user, playlist will generated on user's account.",
+                epilog='Text at the bottom of help')
 
-        parser = argparse.ArgumentParser(
-                    prog='Spotify Playlist Generator',
-                    description="Based on the description provided by the user, playlist will generated on user's account.",
-                    epilog='Text at the bottom of help')
-
-        parser.add_argument('-d', '--description', help="Describe you mood/event for which you want to generate playlist")           # positional argument
-        parser.add_argument('-n', '--number', default = 10, help="Number of songs that needs to be added to the playlist")      # option that takes a value
-        parser.add_argument('-l', '--language', default="hindi", help="Language of songs, it can be hindi/english.")
-        args = parser.parse_args()
-        logger.info(f"description of the playlist : {args.description}")                    
-        logger.info(f"Number of songs that need to be added to the playlist : {args.number}")
-        logger.info(f"Language : {args.language}")
-
-        if not args.description:
-            logger.error("Description cannot be empty, please provide some description.")
-            logger.error("ABORTING")
-            exit(1)
-
-        API_KEY = os.getenv('OPENAI_API_KEY')
-        API_ENDPOINT = os.getenv('OPENAI_ENDPOINT')
-        if not API_KEY or not API_ENDPOINT:
-            raise ValueError("API key or endpoint is not set in the environment variables.")
-
-        openai_client = openai_auth(API_KEY, API_ENDPOINT)        
-        if openai_client:
-            prompt = """
-            You are spotify playlist generator. I will provide you with a mood or situation or event or even a artist/album name. You will have to generate a playlist for me. The playlist should be in a python-valid JSON.
-            In the prompt, user will provide description of the playlist, or it can include an event or a artist name as well.
-            Thr prompt will also include the number of songs that needs to be added, and the language of the songs. The language can be hindi or english.
-            If the language picked is hindi, then pick songs in Hindi language i.e. songs from bollywood i.e. songs created in India.
-            for each track, include, name of the artist and name of the song. Also generate a nice name for the playlist.           
-            Exmaple format:
-            ```json
-            {
-                "PLAYLIST_NAME" : "NAME OF THE PLAYLIST",
-                "1" :
-                {
-                    artist : <ARTIST_NAME>
-                    song : <SONG NAME>
-                },
-                "2": 
-                {
-                    artist : <ARTIST_NAME>
-                    song :   <SONG NAME>
-                }, 
-                "3": {
-                    artist : <ARTIST_NAME>
-                    song :   <SONG NAME>
-                }
-            }```        
-            """
-            user_prompt = f"Generate a playlist with following description: {args.description}, it should have {args.number} songs and the language of songs should be {args.language}."
-            messages = [{"role": "system", "content" : prompt }, {"role": "user", "content": user_prompt}]
-            generated_playlist = openai_chat(openai_client, messages)
-            generated_playlist = generated_playlist.replace("```json", "").replace("```","")
-            generated_playlist_dict = json.loads(generated_playlist)    
-            playlist_name = generated_playlist_dict["PLAYLIST_NAME"]            
-            del generated_playlist_dict["PLAYLIST_NAME"]                        
-            logger.info(f"Playlist JSON: {generated_playlist_dict.values()}")
-            get_song_list_spotify(playlist_name, generated_playlist_dict.values())        
+    parser.add_argument('-d', '--description', help="Describe you mood/event for which you want to generate playlist")           # positional argument
+    parser.add_argument('-n', '--number', type=int, default = 10, help="Number of songs that needs to be added to the playlist")      # option that takes a value
+    parser.add_argument('-l', '--language', default="hindi", help="Language of songs, it can be hindi/english.")
+    parser.add_argument('-b', '--batch', help="JSONL file with one playlist per line, e.g. {\"description\": ..., \"number\": ..., \"language\": ...}")
+    parser.add_argument('-o', '--output', default="batch_results.jsonl", help="JSONL file the batch results and timings are written to")
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help="Playlists, and completions, generated at once in batch mode")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logger.info(f"description of the playlist : {args.description}")                    
+    logger.info(f"Number of songs that need to be added to the playlist : {args.number}")
+    logger.info(f"Language : {args.language}")
 
+    if not args.description and not args.batch:
+        logger.error("Description cannot be empty, please provide some description.")
+        logger.error("ABORTING")
+        exit(1)
+
+    if args.number < 1 or args.concurrency < 1:
+        logger.error("Number of songs and concurrency should be at least 1.")
+        logger.error("ABORTING")
+        exit(1)
+
+    API_KEY = os.getenv('OPENAI_API_KEY')
+    API_ENDPOINT = os.getenv('OPENAI_ENDPOINT')
+    if not API_KEY or not API_ENDPOINT:
+        raise ValueError("API key or endpoint is not set in the environment variables.")
 
+    openai_client = openai_auth(API_KEY, API_ENDPOINT)        
+    if openai_client:
+        if args.batch:
+            run_batch(openai_client, args.batch, args.output, args.concurrency, args.number, args.language)
+        else:
+            create_playlist(openai_client, args.description, args.number, args.language)
+
+
+if __name__ == "__main__":    
+    try:
+        main()
     except ValueError as e:
         logger.info(e)
         logger.info("ABORTING!!!!")
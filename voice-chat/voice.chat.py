@@ -1,36 +1,36 @@
 import os
+import re
+import json
+import glob
+import hashlib
+import itertools
+import queue
+import argparse
 import warnings
-import wave
-import pyaudio
 import sys
-from tenacity import retry, wait_random_exponential, stop_after_attempt
-from openai import AzureOpenAI, AuthenticationError, APIConnectionError, OpenAIError, BadRequestError
+from tenacity import retry, wait_random_exponential, stop_after_attempt, retry_if_not_exception_type
+from openai import AzureOpenAI, OpenAI, AuthenticationError, APIConnectionError, OpenAIError, BadRequestError
 from dotenv import load_dotenv
-import pyttsx3
 import logging
-from datetime import datetime
 from colorama import Fore, Style
 import threading
 import time
-import sounddevice as sd
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque, OrderedDict
+import numpy as np
 import soundfile as sf
 import pyfiglet
+import tiktoken
 
 
 # Suppress FP16 warning for CPU usage
 warnings.filterwarnings(
     "ignore", message="FP16 is not supported on CPU; using FP32 instead")
 
-text = "Welcome to Voice enabled AI Assistant"
-ascii_art = pyfiglet.figlet_format(text, width=100)
-print(ascii_art)
-
 # Creating directory for logs
 if not os.path.exists("logs"):
     os.makedirs("logs")    
 
-if not os.path.exists("recordings"): os.makedirs("recordings")
-
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s %(levelname)s %(name)s %(message)s',
@@ -45,47 +45,333 @@ load_dotenv()
 
 
 CHUNK = 1024
-FORMAT = pyaudio.paInt16
 CHANNELS = 1 if sys.platform == "darwin" else 2
 RATE = 44100
 
-
-def record_audio(seconds):
-
-    current_datetime = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
-    output_path = f"./recordings/user-{current_datetime}.wav"
-
-    # Opening wav file in write binary mode
-    with wave.open(output_path, "wb") as wf:
-        p = pyaudio.PyAudio()
-        info = p.get_host_api_info_by_index(0)
-        numdevices = info.get('deviceCount')
-        for i in range(0, numdevices):
-            if (p.get_device_info_by_host_api_device_index(0, i).get('maxInputChannels')) > 0:
-                logging.info(
-                    f"Input Device id  {i} - {p.get_device_info_by_host_api_device_index(0, i).get('name')}")
-
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(p.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-
-        stream = p.open(format=FORMAT, channels=CHANNELS,
-                        rate=RATE, frames_per_buffer=CHUNK, input=True)
-
-        print(Style.BRIGHT + "Speak now...!!!" + Style.RESET_ALL)
-
-        for index in range(0, RATE//CHUNK * seconds):
-            if index % (RATE//CHUNK) == 0:
-                print(
-                    f"\rRecording... {index // (RATE//CHUNK)} / {seconds}s", end="", flush=True)
-            wf.writeframes(stream.read(CHUNK))
-        print(" Done")
-
-        stream.close()
-        p.terminate()
-    logging.info(f"File saved: {output_path}")
-
-    return output_path
+# Whisper expects 16 kHz mono float32 audio
+WHISPER_RATE = 16000
+
+# Energy based voice activity detection
+VAD_MIN_ENERGY = 0.01           # RMS floor for speech, in full-scale units
+VAD_NOISE_FACTOR = 3.0          # speech must be this much louder than the ambient noise
+VAD_CALIBRATION_SECONDS = 0.3   # ambient noise measured before the first prompt
+VAD_NOISE_ADAPT = 0.05          # how fast the noise floor rises towards louder background frames
+VAD_PREROLL_SECONDS = 0.3       # audio kept from before speech onset
+VAD_SILENCE_SECONDS = 0.8       # trailing silence that ends an utterance
+VAD_MAX_SECONDS = 30
+VAD_WAIT_SECONDS = 15           # give up on a turn if no speech starts within this time
+
+CHAT_MODEL = "gpt-5-chat"
+WHISPER_MODEL = "base"
+TTS_MODEL = "tts_models/en/ljspeech/tacotron2-DDC"
+
+# Synthesized speech cache
+TTS_CACHE_DIR = "tts-cache"
+TTS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+TTS_CACHE_MAX_DISK_BYTES = 256 * 1024 * 1024
+
+# Rolling context window sent with every chat request
+CONTEXT_TOKEN_BUDGET = 2000
+SUMMARY_REFRESH_MESSAGES = 6    # older messages folded into the summary at a time
+
+SYSTEM_PROMPT = "The response will be used convert to speech, so only include english's punctuations and no other special symbols. Keep the responses short and simple."
+
+# Turns kept for the rolling latency percentiles
+LATENCY_WINDOW = 200
+
+# Reported latencies, each measured from the first mark to the second
+LATENCY_STAGES = [
+    ("record", "start", "recorded"),
+    ("transcribe", "recorded", "transcribed"),
+    ("llm_first_token", "transcribed", "first_token"),
+    ("llm", "transcribed", "llm_done"),
+    ("tts", "llm_done", "synthesized"),
+    ("speech_to_first_audio", "recorded", "first_audio"),
+    ("playback", "first_audio", "played"),
+    ("turn", "start", "played"),
+]
+
+# Streamed replies are cut into sentences for pipelined speech synthesis
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def log_input_devices(p):
+    info = p.get_host_api_info_by_index(0)
+    numdevices = info.get('deviceCount')
+    for i in range(0, numdevices):
+        if (p.get_device_info_by_host_api_device_index(0, i).get('maxInputChannels')) > 0:
+            logging.info(
+                f"Input Device id  {i} - {p.get_device_info_by_host_api_device_index(0, i).get('name')}")
+
+
+def frame_to_mono(data):
+    # int16 interleaved frames -> mono float32 in [-1, 1]
+    samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+    if CHANNELS > 1:
+        samples = samples.reshape(-1, CHANNELS).mean(axis=1)
+    return samples
+
+
+def resample(audio, orig_rate, target_rate=WHISPER_RATE):
+    if orig_rate == target_rate:
+        return audio.astype(np.float32)
+    num_samples = int(round(len(audio) * target_rate / orig_rate))
+    positions = np.arange(num_samples) * (orig_rate / target_rate)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def frame_energy(frame):
+    return float(np.sqrt(np.mean(frame ** 2)))
+
+
+def calibrate_noise(stream, seconds=VAD_CALIBRATION_SECONDS):
+    """Measure the ambient noise level, before the user is asked to speak."""
+    frames = max(1, int(seconds * RATE / CHUNK))
+    levels = [frame_energy(frame_to_mono(stream.read(CHUNK, exception_on_overflow=False)))
+              for _ in range(frames)]
+    return float(np.mean(levels))
+
+
+def capture_utterance(stream, noise_floor=None, max_seconds=VAD_MAX_SECONDS,
+                      silence_seconds=VAD_SILENCE_SECONDS, wait_seconds=VAD_WAIT_SECONDS):
+    """
+    Read frames from an open input stream until the speaker stops talking.
+    The noise floor is measured before the prompt when none is passed in, and then
+    follows the frames below the speech threshold, so it adapts to the room
+    without ever learning the speaker's voice as noise.
+    Returns the utterance as a 16 kHz mono float32 array, ready for whisper, or None
+    when no speech started within wait_seconds, together with the updated noise floor.
+    """
+    frames_per_second = RATE / CHUNK
+    silence_frames = max(1, int(silence_seconds * frames_per_second))
+    wait_frames = max(1, int(wait_seconds * frames_per_second))
+    preroll = deque(maxlen=max(1, int(VAD_PREROLL_SECONDS * frames_per_second)))
+    utterance = deque(maxlen=int(max_seconds * frames_per_second))
+
+    if noise_floor is None:
+        noise_floor = calibrate_noise(stream)
+    threshold = max(VAD_MIN_ENERGY, VAD_NOISE_FACTOR * noise_floor)
+    speaking = False
+    waited = 0
+    silent_frames = 0
+
+    print(Style.BRIGHT + "Speak now...!!!" + Style.RESET_ALL)
+    while True:
+        frame = frame_to_mono(stream.read(CHUNK, exception_on_overflow=False))
+        energy = frame_energy(frame)
+
+        if energy <= threshold:
+            # Quieter frames pull the floor down at once, louder background raises it slowly
+            noise_floor = energy if energy < noise_floor else noise_floor + VAD_NOISE_ADAPT * (energy - noise_floor)
+            threshold = max(VAD_MIN_ENERGY, VAD_NOISE_FACTOR * noise_floor)
+
+        if not speaking:
+            preroll.append(frame)
+            if energy > threshold:
+                speaking = True
+                utterance.extend(preroll)
+                print("\rListening...", end="", flush=True)
+            else:
+                waited += 1
+                if waited >= wait_frames:
+                    print("\rNo speech heard.")
+                    logging.info(f"No speech within {wait_seconds}s (threshold {threshold:.4f})")
+                    return None, noise_floor
+            continue
+
+        utterance.append(frame)
+        silent_frames = 0 if energy > threshold else silent_frames + 1
+        if silent_frames >= silence_frames or len(utterance) == utterance.maxlen:
+            break
+    print(" Done")
+
+    audio = resample(np.concatenate(utterance), RATE)
+    logging.info(f"Captured {len(audio) / WHISPER_RATE:.2f}s utterance (threshold {threshold:.4f})")
+    return audio, noise_floor
+
+
+class SpeechCache:
+    """
+    LRU cache of synthesized speech keyed by (normalized text, model, sample rate).
+    Waveforms are kept in memory as float32 up to max_bytes. Phrases that were
+    reused are stored on disk as float16 when they leave memory (or on close), so
+    they load in later runs without running the TTS model again; one-off sentences
+    never reach the disk. The disk store is kept under max_disk_bytes by deleting
+    the least recently used files.
+    """
+
+    def __init__(self, cache_dir=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES,
+                 max_disk_bytes=TTS_CACHE_MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()
+        self.reused = set()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self.disk_size = sum(os.path.getsize(path) for path in glob.glob(os.path.join(cache_dir, "*.npy")))
+
+    @staticmethod
+    def key(text, model, sample_rate):
+        normalized = " ".join(text.lower().split())
+        return hashlib.sha1(f"{model}|{sample_rate}|{normalized}".encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, text, model, sample_rate):
+        key = self.key(text, model, sample_rate)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.reused.add(key)
+                self.hits += 1
+                return self.entries[key]
+        path = self.path(key)
+        try:
+            wav = np.load(path).astype(np.float32)
+            # The file's mtime is its last use, for the disk LRU
+            os.utime(path)
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+            evicted = self._remember(key, wav)
+        self._spill(evicted)
+        return wav
+
+    def put(self, text, model, sample_rate, wav):
+        key = self.key(text, model, sample_rate)
+        with self.lock:
+            evicted = self._remember(key, wav)
+        self._spill(evicted)
+
+    def _remember(self, key, wav):
+        """Keep wav in memory, returns the evicted entries that should go to disk."""
+        if key in self.entries:
+            self.size -= self.entries.pop(key).nbytes
+        self.entries[key] = wav
+        self.size += wav.nbytes
+        evicted = []
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            evicted_key, evicted_wav = self.entries.popitem(last=False)
+            self.size -= evicted_wav.nbytes
+            if evicted_key in self.reused:
+                self.reused.discard(evicted_key)
+                evicted.append((evicted_key, evicted_wav))
+        return evicted
+
+    def _spill(self, entries):
+        if not entries:
+            return
+        for key, wav in entries:
+            path = self.path(key)
+            if os.path.exists(path):
+                continue
+            try:
+                np.save(path, wav.astype(np.float16))
+                self.disk_size += os.path.getsize(path)
+            except OSError as e:
+                logging.error(f"Could not write speech cache entry: {e}")
+        if self.disk_size > self.max_disk_bytes:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        files = []
+        for path in glob.glob(os.path.join(self.cache_dir, "*.npy")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        self.disk_size = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if self.disk_size <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                self.disk_size -= size
+            except OSError as e:
+                logging.error(f"Could not remove speech cache entry: {e}")
+
+    def close(self):
+        # Reused phrases still in memory are kept for the next run
+        with self.lock:
+            entries = [(key, self.entries[key]) for key in self.reused if key in self.entries]
+            self.reused.clear()
+        self._spill(entries)
+
+
+class VoiceSession:
+    """
+    Audio devices and the TTS model shared by every voice_chat turn.
+    The devices are opened once at startup and closed on exit, so a turn does
+    not pay for PyAudio setup or device enumeration.
+    """
+
+    def __init__(self, tts, speech_cache=None):
+        self.tts = tts
+        self.speech_cache = speech_cache
+        self.pyaudio = None
+        self.input_stream = None
+        self.output_stream = None
+        # Measured on the first turn, then carried over so later prompts don't recalibrate
+        self.noise_floor = None
+
+    def open(self):
+        # PyAudio and sounddevice need PortAudio, so they are only imported once audio is used
+        import pyaudio
+        self.pyaudio = pyaudio.PyAudio()
+        log_input_devices(self.pyaudio)
+        # The stream is only started while listening, so it does not overflow between turns
+        self.input_stream = self.pyaudio.open(format=pyaudio.paInt16, channels=CHANNELS,
+                                              rate=RATE, frames_per_buffer=CHUNK,
+                                              input=True, start=False)
+        return self
+
+    def playback_stream(self):
+        # Opened on first use and kept for the session, pipelined playback writes sentences into it back to back
+        if self.output_stream is None:
+            import sounddevice as sd
+            self.output_stream = sd.OutputStream(samplerate=self.tts.synthesizer.output_sample_rate,
+                                                 channels=1, dtype="float32")
+            self.output_stream.start()
+        return self.output_stream
+
+    def record(self, max_seconds=VAD_MAX_SECONDS):
+        self.input_stream.start_stream()
+        try:
+            audio, self.noise_floor = capture_utterance(self.input_stream, self.noise_floor, max_seconds)
+            return audio
+        finally:
+            self.input_stream.stop_stream()
+
+    def close(self):
+        if self.input_stream is not None:
+            self.input_stream.close()
+            self.input_stream = None
+        if self.pyaudio is not None:
+            self.pyaudio.terminate()
+            self.pyaudio = None
+        if self.output_stream is not None:
+            self.output_stream.close()
+            self.output_stream = None
+        if self.speech_cache is not None:
+            self.speech_cache.close()
+            logging.info(f"Speech cache hits: {self.speech_cache.hits}, misses: {self.speech_cache.misses}")
+        logging.info("Voice session closed")
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc_info):
+        self.close()
 
 
 def openai_client():
@@ -128,32 +414,11 @@ def openai_client():
     return ac
 
 
-def text_to_speech(text_to_speak):
-    # Loading text to speech engine
-    try:
-        logging.info("Creating speech engine")
-        engine = pyttsx3.init()
-    except Exception as e:
-        logging.error(f"Error initializing pyttsx3 engine: {e}")
-
-    # Get current speed(words per minute) at which speech is being spoken
-    rate = engine.getProperty('rate')
-    engine.setProperty('rate', rate - 25)
-
-
-    try:
-        logging.info("Speaking text...")
-        engine.say(text_to_speak)
-        engine.runAndWait()
-    except Exception as e:
-        logging.error(f"Error during speech generation: {e}")
-
-
 @retry(wait=wait_random_exponential(min=1, max=20), stop=stop_after_attempt(3))
 def openai_chat(ac, messages):
     try:
         response = ac.chat.completions.create(
-            model="gpt-5-chat",
+            model=CHAT_MODEL,
             messages=messages
         )
 
@@ -176,6 +441,265 @@ def openai_chat(ac, messages):
     return response
 
 
+# Only opening the stream is retried, once sentences are being spoken the reply can't be restarted.
+# Errors are raised instead of exiting, so tenacity can retry them and pipelined_reply can recover.
+@retry(wait=wait_random_exponential(min=1, max=20), stop=stop_after_attempt(3),
+       retry=retry_if_not_exception_type(BadRequestError), reraise=True)
+def openai_chat_stream(ac, messages):
+    try:
+        stream = ac.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=messages,
+            stream=True
+        )
+    except APIConnectionError as e:
+        logging.error(f"Error Connecting with AzureOpenAI endpoint : {str(e)}")
+        raise
+    except BadRequestError as e:
+        logging.error("Malformed Request.")
+        logging.error(str(e))
+        raise
+    except Exception as e:
+        logging.error(str(e))
+        raise
+
+    return stream
+
+
+def iter_sentences(stream, timer=None):
+    """Yield complete sentences from a streamed chat completion as soon as they end."""
+    buffer = ""
+    for chunk in stream:
+        # Azure sends a leading chunk with no choices (content filter results)
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        if timer is not None:
+            timer.mark("first_token")
+        buffer += chunk.choices[0].delta.content
+        *sentences, buffer = SENTENCE_END.split(buffer)
+        for sentence in sentences:
+            if sentence.strip():
+                yield sentence.strip()
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def synthesize(tts, text, cache=None):
+    if cache is not None:
+        model_name = getattr(tts, "model_name", None) or TTS_MODEL
+        sample_rate = tts.synthesizer.output_sample_rate
+        wav = cache.get(text, model_name, sample_rate)
+        if wav is not None:
+            return wav
+
+    import torch
+    with torch.inference_mode():
+        wav = tts.tts(text)
+    wav = np.asarray(wav, dtype=np.float32)
+
+    if cache is not None:
+        cache.put(text, model_name, sample_rate, wav)
+    return wav
+
+
+def pipelined_reply(ac, session, messages, timer=None):
+    """
+    Stream the completion and speak it sentence by sentence.
+    Sentences are synthesized on a worker thread while earlier ones play, and
+    playback writes them back to back into the session's output stream, so the
+    first audio starts after one sentence instead of the whole answer.
+    Returns the reply text and whether the stream completed; when it failed
+    part way the text is only what was spoken before the failure.
+    """
+    sentences = queue.Queue()
+    audio = queue.Queue()
+    tts = session.tts
+
+    def synthesis_worker():
+        while (sentence := sentences.get()) is not None:
+            try:
+                audio.put((sentence, synthesize(tts, sentence, session.speech_cache)))
+            except Exception:
+                logging.exception(f"Synthesis failed for: {sentence}")
+        audio.put(None)
+
+    def playback_worker():
+        print(Fore.BLUE + "ASSISTANT: " + Style.BRIGHT, end="", flush=True)
+        try:
+            while (item := audio.get()) is not None:
+                sentence, wav = item
+                print(sentence, end=" ", flush=True)
+                if timer is not None:
+                    timer.mark("first_audio")
+                session.playback_stream().write(wav.reshape(-1, 1))
+        except Exception:
+            logging.exception("Playback failed")
+            # Keep draining so the synthesis worker never blocks
+            while audio.get() is not None:
+                pass
+        finally:
+            print(Style.RESET_ALL)
+
+    workers = [threading.Thread(target=synthesis_worker, daemon=True),
+               threading.Thread(target=playback_worker, daemon=True)]
+    for worker in workers:
+        worker.start()
+
+    reply = []
+    completed = False
+    try:
+        for sentence in iter_sentences(openai_chat_stream(ac, messages), timer):
+            reply.append(sentence)
+            sentences.put(sentence)
+        completed = True
+    except Exception:
+        logging.exception("Streaming completion failed")
+    finally:
+        if timer is not None:
+            timer.mark("llm_done")
+        sentences.put(None)
+        for worker in workers:
+            worker.join()
+        if timer is not None:
+            timer.mark("played")
+
+    return " ".join(reply), completed
+
+
+def print_banner():
+    text = "Welcome to Voice enabled AI Assistant"
+    ascii_art = pyfiglet.figlet_format(text, width=100)
+    print(ascii_art)
+
+
+def load_whisper_model(name=WHISPER_MODEL):
+    start = time.perf_counter()
+    import whisper
+    model = whisper.load_model(name)
+    loaded = time.perf_counter()
+    # Warm-up on a second of silence, so the first real turn doesn't pay for allocations
+    model.transcribe(np.zeros(WHISPER_RATE, dtype=np.float32))
+    return model, {"load": loaded - start, "warmup": time.perf_counter() - loaded}
+
+
+def load_tts_model(name=TTS_MODEL, device="cpu"):
+    start = time.perf_counter()
+    from TTS.api import TTS
+    tts = TTS(name, progress_bar=True).to(device)
+    loaded = time.perf_counter()
+    synthesize(tts, "Hello.")
+    return tts, {"load": loaded - start, "warmup": time.perf_counter() - loaded}
+
+
+def load_models(whisper_name=WHISPER_MODEL, tts_name=TTS_MODEL, device="cpu"):
+    """
+    Import torch, whisper and TTS, then load and warm up the Whisper and TTS models
+    concurrently in background threads while the Azure client is created, and
+    report how long each stage took.
+    """
+    print("Loading Whisper and TTS models....")
+    start = time.perf_counter()
+    # whisper and TTS both import torch, which is not safe to import from two threads at once,
+    # so the imports run here and the loader threads find the modules already initialised
+    import torch
+    import whisper
+    from TTS.api import TTS
+    timings = {"imports": {"load": time.perf_counter() - start, "warmup": 0.0}}
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-loader") as executor:
+        whisper_future = executor.submit(load_whisper_model, whisper_name)
+        tts_future = executor.submit(load_tts_model, tts_name, device)
+
+        client_start = time.perf_counter()
+        ac = openai_client()
+        timings["azure client"] = {"load": time.perf_counter() - client_start, "warmup": 0.0}
+
+        model, timings["whisper"] = whisper_future.result()
+        tts, timings["tts"] = tts_future.result()
+
+    for stage, timing in timings.items():
+        print(f"{stage:<14} loaded in {timing['load']:.2f}s, warm-up {timing['warmup']:.2f}s")
+        logging.info(f"{stage} loaded in {timing['load']:.2f}s, warm-up {timing['warmup']:.2f}s")
+    print(f"Ready in {time.perf_counter() - start:.2f}s")
+    return ac, model, tts
+
+
+def load_wav(path):
+    # Any WAV file -> 16 kHz mono float32, the same input whisper gets from the microphone
+    audio, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+    return resample(audio.mean(axis=1), sample_rate)
+
+
+def canned_llm(responses_file=None, latency_ms=0):
+    """LLM stand-in that cycles through canned replies, one per line, after a simulated delay."""
+    responses = ["Sure, here is a short answer to your question. Let me know if you need anything else."]
+    if responses_file:
+        with open(responses_file) as f:
+            responses = [line.strip() for line in f if line.strip()]
+    replies = itertools.cycle(responses)
+
+    def reply(messages):
+        time.sleep(latency_ms / 1000)
+        return next(replies)
+    return reply
+
+
+def stub_server_llm(endpoint):
+    """LLM stand-in backed by a local OpenAI compatible server, e.g. a stub or llama.cpp."""
+    client = OpenAI(base_url=endpoint, api_key="benchmark")
+
+    def reply(messages):
+        response = client.chat.completions.create(model=CHAT_MODEL, messages=messages)
+        return response.to_dict()["choices"][0]["message"]["content"]
+    return reply
+
+
+def run_benchmark(wav_dir, whisper_models, tts_models, llm_reply, device="cpu"):
+    """
+    Feed every WAV file in wav_dir through transcription, the LLM stand-in and
+    speech synthesis (without playback) for each combination of Whisper and TTS
+    model, and report throughput and per-stage latency percentiles.
+    """
+    files = sorted(glob.glob(os.path.join(wav_dir, "*.wav")))
+    if not files:
+        print(f"No WAV files found in {wav_dir}")
+        exit(1)
+    utterances = [(path, load_wav(path)) for path in files]
+    audio_seconds = sum(len(audio) for _, audio in utterances) / WHISPER_RATE
+    print(f"Benchmarking {len(utterances)} utterances, {audio_seconds:.1f}s of audio")
+
+    tts_loaded = {}
+    for tts_name in tts_models:
+        tts_loaded[tts_name], timing = load_tts_model(tts_name, device)
+        print(f"{tts_name} loaded in {timing['load']:.2f}s, warm-up {timing['warmup']:.2f}s")
+
+    for whisper_name in whisper_models:
+        model, timing = load_whisper_model(whisper_name)
+        print(f"whisper {whisper_name} loaded in {timing['load']:.2f}s, warm-up {timing['warmup']:.2f}s")
+        for tts_name, tts in tts_loaded.items():
+            stats = LatencyStats()
+            start = time.perf_counter()
+            for path, audio in utterances:
+                timer = TurnTimer()
+                timer.mark("recorded")
+                text = model.transcribe(audio)["text"]
+                timer.mark("transcribed")
+                response = llm_reply([{"role": "system", "content": SYSTEM_PROMPT},
+                                      {"role": "user", "content": text}])
+                timer.mark("llm_done")
+                synthesize(tts, response)
+                timer.mark("synthesized")
+                stages = timer.stages()
+                stages["total"] = timer.marks["synthesized"] - timer.marks["start"]
+                stats.record(stages)
+                logging.info(f"Benchmark {path}: {text}")
+            elapsed = time.perf_counter() - start
+
+            print(f"\nwhisper={whisper_name} tts={tts_name}: {len(utterances)} utterances in {elapsed:.2f}s, "
+                  f"{len(utterances) / elapsed:.2f} utterances/s, real-time factor {elapsed / audio_seconds:.2f}")
+            stats.print_summary()
+
+
 def slow_print_words(text, delay=0.4):
     #Print each word with a slight delay
     words = text.split()    
@@ -185,30 +709,181 @@ def slow_print_words(text, delay=0.4):
     print()
 
 
-def voice_chat(ac, model, tts):
-    messages = [{"role": "system", "content": "The response will be used convert to speech, so only include english's punctuations and no other special symbols. Keep the responses short and simple."}]
+class TurnTimer:
+    """Monotonic timestamps for the stages of one voice_chat turn. Only the first mark of a name counts."""
+
+    def __init__(self):
+        self.marks = {"start": time.perf_counter()}
+
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter()
+
+    def stages(self):
+        return {stage: self.marks[end] - self.marks[begin]
+                for stage, begin, end in LATENCY_STAGES
+                if begin in self.marks and end in self.marks}
+
+
+class LatencyStats:
+    """Rolling p50/p95/p99 per stage over the last `window` turns, optionally logged as JSONL."""
+
+    def __init__(self, window=LATENCY_WINDOW, log_path=None):
+        self.window = window
+        self.samples = {}
+        self.log_path = log_path
+
+    def record(self, stages):
+        for stage, seconds in stages.items():
+            self.samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+        logging.info("Turn latency: " + ", ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in stages.items()))
+        if self.log_path:
+            try:
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps({"time": time.time(), **stages}) + "\n")
+            except OSError as e:
+                logging.error(f"Could not write latency log: {e}")
+
+    def percentiles(self):
+        return {stage: dict(zip(("count", "p50", "p95", "p99"),
+                                (len(samples), *np.percentile(list(samples), [50, 95, 99]))))
+                for stage, samples in self.samples.items()}
+
+    def print_summary(self):
+        if not self.samples:
+            return
+        print(f"\n{'stage':<24}{'count':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for stage, stats in self.percentiles().items():
+            print(f"{stage:<24}{stats['count']:>6}{stats['p50'] * 1000:>10.0f}"
+                  f"{stats['p95'] * 1000:>10.0f}{stats['p99'] * 1000:>10.0f}")
+
+
+class Conversation:
+    """
+    Chat history that stays the same size however long the session runs.
+    Keeps the system prompt, the most recent turns that fit in token_budget
+    (counted with tiktoken), and a summary of the older turns. The summary is
+    refreshed on a background thread once enough turns have been dropped, so
+    no turn waits on it.
+    """
+
+    def __init__(self, ac, system_prompt=SYSTEM_PROMPT, token_budget=CONTEXT_TOKEN_BUDGET,
+                 refresh_after=SUMMARY_REFRESH_MESSAGES):
+        self.ac = ac
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.refresh_after = refresh_after
+        self.turns = deque()
+        self.turn_tokens = 0
+        self.dropped = []
+        self.summary = ""
+        self.summarizer = None
+        self.lock = threading.Lock()
+        try:
+            self.encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logging.error(f"Could not load tiktoken encoding, estimating tokens from length: {e}")
+            self.encoding = None
+
+    def count_tokens(self, text):
+        if self.encoding is None:
+            return len(text) // 4 + 1
+        return len(self.encoding.encode(text))
+
+    def append(self, role, content):
+        # Every message carries a few tokens of overhead on top of its content
+        tokens = self.count_tokens(content) + 4
+        with self.lock:
+            self.turns.append(({"role": role, "content": content}, tokens))
+            self.turn_tokens += tokens
+            while self.turn_tokens > self.token_budget and len(self.turns) > 1:
+                message, tokens = self.turns.popleft()
+                self.turn_tokens -= tokens
+                self.dropped.append(message)
+            refresh = len(self.dropped) >= self.refresh_after and self.summarizer is None
+            if refresh:
+                pending, self.dropped = self.dropped, []
+                self.summarizer = threading.Thread(target=self._refresh_summary, args=(pending,), daemon=True)
+                self.summarizer.start()
+
+    def messages(self):
+        with self.lock:
+            messages = [{"role": "system", "content": self.system_prompt}]
+            if self.summary:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+            messages.extend(message for message, _ in self.turns)
+        return messages
+
+    def _refresh_summary(self, pending):
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in pending)
+        prompt = ("Update the summary of a conversation between a user and a voice assistant. "
+                  "Keep names, facts and open questions, in under 150 words.\n\n"
+                  f"Current summary: {self.summary or 'None'}\n\nNew messages:\n{transcript}")
+        try:
+            response = self.ac.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            summary = response.to_dict()["choices"][0]["message"]["content"]
+            with self.lock:
+                self.summary = summary
+            logging.info(f"Conversation summary refreshed: {summary}")
+        except Exception as e:
+            logging.error(f"Could not refresh conversation summary: {e}")
+            # Keep the messages so the next refresh folds them in
+            with self.lock:
+                self.dropped = pending + self.dropped
+        finally:
+            with self.lock:
+                self.summarizer = None
+
+
+def voice_chat(ac, model, session, pipelined=False, context_tokens=CONTEXT_TOKEN_BUDGET, stats=None):
+    conversation = Conversation(ac, token_budget=context_tokens)
     while True:
-        # Recording Audio
-        file = record_audio(7)
+        timer = TurnTimer()
 
-        # Using whisper to convert audio to text
-        result = model.transcribe(file)
+        # Recording Audio until the user stops speaking
+        audio = session.record()
+        if audio is None:
+            continue
+        timer.mark("recorded")
+
+        # Using whisper to convert audio to text, straight from memory
+        result = model.transcribe(audio)
+        timer.mark("transcribed")
 
         print(Fore.GREEN + "USER: " + Style.BRIGHT +
               f"{result['text']}" + Style.RESET_ALL)
         logging.info(f"role : user , content: {result['text']}")
         # Adding user's message to the chat's history or context
-        messages.append({"role": "user", "content": result["text"]})
+        conversation.append("user", result["text"])
+
+        if pipelined:
+            # Streaming the answer and speaking it while it is generated
+            response, completed = pipelined_reply(ac, session, conversation.messages(), timer)
+            if completed:
+                logging.info(f"role : assistant , content: {response}")
+                conversation.append("assistant", response)
+            else:
+                # A cut off answer is not kept in the history, the next turn asks again
+                logging.error(f"Reply cut off, not added to the history: {response}")
+                print(Fore.RED + "The answer was cut off, please ask again." + Style.RESET_ALL)
+            if stats is not None:
+                stats.record(timer.stages())
+            time.sleep(1)
+            continue
 
         # Asking question to LLM
-        response = openai_chat(ac, messages)
+        response = openai_chat(ac, conversation.messages())
+        timer.mark("llm_done")
 
         # Adding LLM's response to message history or context
         logging.info(f"role : assistant , content: {response}")
-        messages.append({"role": "assistant", "content": response})
+        conversation.append("assistant", response)
 
         #Start both the threads
-        # t1 = threading.Thread(target=speak, args=(tts, response, ))        
+        # t1 = threading.Thread(target=speak, args=(session, response, ))        
         # t2 = threading.Thread(target=slow_print_words, args=(
         #     Fore.BLUE + "ASSISTANT: " + Style.BRIGHT + f"{response}" + Style.RESET_ALL,))
 
@@ -220,62 +895,92 @@ def voice_chat(ac, model, tts):
         speak_text=response    
         print_text=Fore.BLUE + "ASSISTANT: " + Style.BRIGHT + f"{response}" + Style.RESET_ALL
 
-        speak_and_print(tts,speak_text, print_text)
+        speak_and_print(session, speak_text, print_text, timer)
         logging.info("All threads finished!")
+        if stats is not None:
+            stats.record(timer.stages())
 
         time.sleep(1)
 
-def speak_and_print(tts, speak_text, print_text):
+def speak_and_print(session, speak_text, print_text, timer=None):
     # speaker = "Gracie Wise"
-    # current_datetime = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
-    # wav_file_path = f"./recordings/bot-{current_datetime}.wav"
-    with torch.inference_mode():
-        wav = tts.tts(speak_text)
-    sr = tts.synthesizer.output_sample_rate
+    wav = synthesize(session.tts, speak_text, session.speech_cache)
+    if timer is not None:
+        timer.mark("synthesized")
+    # The words are printed alongside playback, the write returns once the audio is queued
+    printer = threading.Thread(target=slow_print_words, args=(print_text,), daemon=True)
     try:
-        sd.play(wav, sr); 
-        slow_print_words(print_text)
-        sd.wait()
+        stream = session.playback_stream()
+        printer.start()
+        if timer is not None:
+            timer.mark("first_audio")
+        stream.write(wav.reshape(-1, 1))
     except Exception as e:
         logging.exception("Playback failed")    
     finally:
-        sd.stop()  
+        if printer.is_alive():
+            printer.join()
+        if timer is not None:
+            timer.mark("played")
 
-def speak(tts, text):
+def speak(session, text):
     # speaker = "Gracie Wise"
-    # current_datetime = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
-    # wav_file_path = f"./recordings/bot-{current_datetime}.wav"
-    with torch.inference_mode():
-        wav = tts.tts(text)
-    sr = tts.synthesizer.output_sample_rate
+    wav = synthesize(session.tts, text, session.speech_cache)
     try:
-        sd.play(wav, sr); 
-        sd.wait()
+        session.playback_stream().write(wav.reshape(-1, 1))
     except Exception as e:
         logging.exception("Playback failed")    
-    finally:
-        sd.stop()        
 
 
 if __name__ == "__main__":
-    
-    # Loading whisper model
-    import whisper
-    print("Loading Whisper Model....")
-    model = whisper.load_model("base")
-    print("Whisper Model loaded")
-
-    # Creating Azure OpenAI client
-    ac = openai_client()
-
-    device = "cpu"
-    
-    print("Loading TTS Model....")
-    import torch
-    from TTS.api import TTS    
-    tts = TTS("tts_models/en/ljspeech/tacotron2-DDC",progress_bar=True).to(device)
-    print("TTS Model Loaded")
+    parser = argparse.ArgumentParser(description="Voice enabled AI Assistant")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Stream the reply and start speaking after the first sentence")
+    parser.add_argument("--context-tokens", type=int, default=CONTEXT_TOKEN_BUDGET,
+                        help="Token budget for the recent turns sent with every request")
+    parser.add_argument("--tts-cache-dir", default=TTS_CACHE_DIR,
+                        help="Directory for cached synthesized speech")
+    parser.add_argument("--tts-cache-mb", type=int, default=TTS_CACHE_MAX_BYTES // (1024 * 1024),
+                        help="In-memory size of the synthesized speech cache, 0 disables caching")
+    parser.add_argument("--tts-cache-disk-mb", type=int, default=TTS_CACHE_MAX_DISK_BYTES // (1024 * 1024),
+                        help="Size limit of the synthesized speech cache on disk")
+    parser.add_argument("--latency-log", metavar="PATH",
+                        help="Append per-turn stage latencies to this JSONL file")
+    parser.add_argument("--benchmark", metavar="WAV_DIR",
+                        help="Run the pipeline offline over the WAV files in this directory and report latencies")
+    parser.add_argument("--whisper-models", default=WHISPER_MODEL,
+                        help="Comma separated Whisper model sizes to benchmark")
+    parser.add_argument("--tts-models", default=TTS_MODEL,
+                        help="Comma separated TTS models to benchmark")
+    parser.add_argument("--llm-endpoint",
+                        help="OpenAI compatible stub server used instead of Azure when benchmarking")
+    parser.add_argument("--canned-responses", metavar="PATH",
+                        help="File with one canned reply per line used instead of Azure when benchmarking")
+    parser.add_argument("--llm-latency-ms", type=int, default=0,
+                        help="Simulated latency of canned replies")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        if args.llm_endpoint:
+            llm_reply = stub_server_llm(args.llm_endpoint)
+        else:
+            llm_reply = canned_llm(args.canned_responses, args.llm_latency_ms)
+        run_benchmark(args.benchmark, args.whisper_models.split(","), args.tts_models.split(","), llm_reply)
+        exit(0)
+
+    print_banner()
+
+    # Loading whisper and TTS models in the background while the Azure OpenAI client is created
+    ac, model, tts = load_models(device="cpu")
+    stats = LatencyStats(log_path=args.latency_log)
     try:            
-        voice_chat(ac, model, tts)
+        speech_cache = None
+        if args.tts_cache_mb > 0:
+            speech_cache = SpeechCache(args.tts_cache_dir, args.tts_cache_mb * 1024 * 1024,
+                                       args.tts_cache_disk_mb * 1024 * 1024)
+        with VoiceSession(tts, speech_cache) as session:
+            voice_chat(ac, model, session, args.pipelined, args.context_tokens, stats)
     except KeyboardInterrupt:
-        print("Stopping AI Voice Assistant")    
+        print("Stopping AI Voice Assistant")
+    finally:
+        stats.print_summary()    